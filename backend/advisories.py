@@ -0,0 +1,331 @@
+"""Índice local de avisos de seguridad (volcados de OSV) para SCA sin red
+
+Los avisos se cargan en una base de datos SQLite en disco con un índice por
+(ecosistema, paquete), de modo que comprobar un paquete es una consulta
+indexada más la comparación de versiones de sus rangos afectados. El índice
+se construye en un archivo temporal y se instala con os.replace(): los
+escaneos que ya lo tenían abierto siguen leyendo la versión anterior y los
+nuevos abren la nueva, sin bloqueos.
+
+Uso:
+    python advisories.py fetch PyPI npm          descargar volcados de OSV y reconstruir
+    python advisories.py build PyPI.zip npm.zip  reconstruir desde volcados locales
+    python advisories.py stats
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import zipfile
+import logging
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+# Volcados completos de OSV por ecosistema
+OSV_DUMP_URL = os.getenv("OSV_DUMP_URL", "https://osv-vulnerabilities.storage.googleapis.com/{ecosystem}/all.zip")
+
+SEVERITY_MAP = {"CRITICAL": "critical", "HIGH": "high", "MODERATE": "medium", "MEDIUM": "medium", "LOW": "low"}
+
+class AdvisoryIndexError(Exception):
+    """Índice de avisos ausente o inválido"""
+
+def index_path() -> str:
+    return os.path.join(storage.DATA_DIR, "advisories", "advisories.db")
+
+def normalize_name(ecosystem: str, name: str) -> str:
+    """Nombre canónico del paquete (PEP 503 en PyPI)"""
+    if ecosystem == "PyPI":
+        return re.sub(r"[-_.]+", "-", name).lower()
+    return name
+
+_PRE_PHASES = {"a": 0, "alpha": 0, "b": 1, "beta": 1, "c": 2, "rc": 2, "pre": 2, "preview": 2}
+_PEP440_SUFFIX = re.compile(
+    r"^[-_.]?(?:(?P<pre>a|alpha|b|beta|c|rc|pre|preview)[-_.]?(?P<pre_n>\d*))?"
+    r"(?:(?:[-_.]?(?:post|rev|r)[-_.]?(?P<post_n>\d*))|-(?P<post_implicit>\d+))?"
+    r"(?:[-_.]?dev[-_.]?(?P<dev_n>\d*))?$"
+)
+
+@lru_cache(maxsize=65536)
+def version_key(version: str) -> tuple:
+    """Clave de ordenación de versiones PEP 440 y SemVer
+
+    Cubre las formas habituales de ambos esquemas: épocas, versiones
+    pre-release (a/b/rc y -beta.1), post y dev. Las pre-release ordenan
+    antes que la versión final; los ceros finales no cuentan (1.0 == 1.0.0).
+    """
+    version = version.strip().lower()
+    if version.startswith("v"):
+        version = version[1:]
+    version = version.split("+", 1)[0]
+    epoch = 0
+    if "!" in version:
+        epoch_text, version = version.split("!", 1)
+        epoch = int(epoch_text) if epoch_text.isdigit() else 0
+    match = re.match(r"\d+(?:\.\d+)*", version)
+    if match is None:
+        # Versión no numérica: se ordena después de cualquier versión numérica
+        return (epoch, (float("inf"),), (1,), (-1,), (1,), version)
+    release = [int(part) for part in match.group().split(".")]
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()
+    suffix = version[match.end():]
+
+    pre, post, dev = (1,), (-1,), (1,)
+    pep440 = _PEP440_SUFFIX.match(suffix)
+    if pep440:
+        if pep440.group("pre"):
+            pre = (0, _PRE_PHASES[pep440.group("pre")], int(pep440.group("pre_n") or 0))
+        post_n = pep440.group("post_n") if pep440.group("post_n") is not None else pep440.group("post_implicit")
+        if post_n is not None:
+            post = (int(post_n or 0),)
+        if pep440.group("dev_n") is not None:
+            dev = (0, int(pep440.group("dev_n") or 0))
+            if not pep440.group("pre") and post == (-1,):
+                pre = (-1,)
+    elif suffix.startswith("-"):
+        # Pre-release SemVer: identificadores numéricos antes que alfanuméricos
+        identifiers = [
+            (0, int(part), "") if part.isdigit() else (1, 0, part)
+            for part in suffix[1:].split(".")
+        ]
+        pre = (0, -1, 0, tuple(identifiers))
+    else:
+        return (epoch, tuple(release), (1,), (-1,), (1,), suffix)
+    return (epoch, tuple(release), pre, post, dev, "")
+
+def _affected_ranges(affected: Dict[str, Any]) -> Iterator[Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """Intervalos (introduced, fixed, last_affected) de los rangos ECOSYSTEM/SEMVER"""
+    for version_range in affected.get("ranges") or []:
+        if version_range.get("type") not in ("ECOSYSTEM", "SEMVER"):
+            continue
+        introduced = None
+        open_interval = False
+        for event in version_range.get("events") or []:
+            if "introduced" in event:
+                if open_interval:
+                    yield introduced, None, None
+                introduced = event["introduced"]
+                open_interval = True
+            elif open_interval and ("fixed" in event or "last_affected" in event or "limit" in event):
+                yield introduced, event.get("fixed") or event.get("limit"), event.get("last_affected")
+                open_interval = False
+        if open_interval:
+            yield introduced, None, None
+
+def _severity(advisory: Dict[str, Any]) -> str:
+    for source in [advisory.get("database_specific") or {}] + [
+        affected.get("database_specific") or {} for affected in advisory.get("affected") or []
+    ]:
+        severity = str(source.get("severity", "")).upper()
+        if severity in SEVERITY_MAP:
+            return SEVERITY_MAP[severity]
+    return "unknown"
+
+def _iter_osv_documents(source: str) -> Iterator[Dict[str, Any]]:
+    """Avisos OSV de un .zip de volcado, un directorio o un archivo JSON"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    with archive.open(name) as f:
+                        yield json.load(f)
+    elif os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.endswith(".json"):
+                    with open(os.path.join(root, name), "rb") as f:
+                        yield json.load(f)
+    else:
+        with open(source, "rb") as f:
+            yield json.load(f)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE advisories (
+    id TEXT PRIMARY KEY,
+    summary TEXT,
+    severity TEXT,
+    aliases TEXT
+);
+CREATE TABLE affected (
+    ecosystem TEXT NOT NULL,
+    package TEXT NOT NULL,
+    advisory_id TEXT NOT NULL,
+    introduced TEXT,
+    fixed TEXT,
+    last_affected TEXT,
+    versions TEXT
+);
+"""
+
+def build_index(sources: List[str], path: Optional[str] = None) -> Dict[str, Any]:
+    """Construir el índice desde volcados OSV e instalarlo de forma atómica"""
+    path = path or index_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(temp_path)
+        try:
+            conn.executescript(SCHEMA)
+            digest = hashlib.sha256()
+            advisories = 0
+            for source in sources:
+                for advisory in _iter_osv_documents(source):
+                    if not advisory.get("id") or advisory.get("withdrawn"):
+                        continue
+                    digest.update(advisory["id"].encode() + str(advisory.get("modified", "")).encode())
+                    advisories += 1
+                    conn.execute(
+                        "INSERT OR REPLACE INTO advisories VALUES (?, ?, ?, ?)",
+                        (advisory["id"], advisory.get("summary") or advisory.get("details", "")[:500],
+                         _severity(advisory), json.dumps(advisory.get("aliases") or []))
+                    )
+                    rows = []
+                    for affected in advisory.get("affected") or []:
+                        package = affected.get("package") or {}
+                        ecosystem = package.get("ecosystem", "").split(":", 1)[0]
+                        if not ecosystem or not package.get("name"):
+                            continue
+                        name = normalize_name(ecosystem, package["name"])
+                        versions = json.dumps(affected.get("versions") or [])
+                        ranges = list(_affected_ranges(affected))
+                        if not ranges:
+                            rows.append((ecosystem, name, advisory["id"], None, None, None, versions))
+                        for introduced, fixed, last_affected in ranges:
+                            rows.append((ecosystem, name, advisory["id"], introduced, fixed, last_affected, versions))
+                    conn.executemany("INSERT INTO affected VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("CREATE INDEX idx_affected_package ON affected (ecosystem, package)")
+            version = f"{datetime.utcnow():%Y%m%d%H%M%S}-{digest.hexdigest()[:12]}"
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", version),
+                ("built_at", datetime.utcnow().isoformat()),
+                ("advisories", str(advisories)),
+                ("sources", json.dumps([os.path.basename(source) for source in sources]))
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        # Los lectores abiertos conservan el archivo anterior; los nuevos ven éste
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    logger.info(f"Advisory index {version} built with {advisories} advisories")
+    return {"version": version, "advisories": advisories}
+
+def fetch_dumps(ecosystems: List[str], timeout: float = 300) -> List[str]:
+    """Descargar los volcados OSV de los ecosistemas indicados"""
+    import requests
+
+    directory = os.path.join(storage.DATA_DIR, "advisories", "dumps")
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for ecosystem in ecosystems:
+        path = os.path.join(directory, f"{ecosystem}.zip")
+        with requests.get(OSV_DUMP_URL.format(ecosystem=ecosystem), stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+        os.replace(f.name, path)
+        paths.append(path)
+    return paths
+
+class AdvisoryIndex:
+    """Consultas de solo lectura sobre el índice de avisos
+
+    Abre una instantánea del índice: si se reconstruye mientras tanto, esta
+    instancia sigue viendo la versión con la que se abrió.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        path = path or index_path()
+        if not os.path.exists(path):
+            raise AdvisoryIndexError(f"Advisory index not found at {path}, run: python advisories.py fetch")
+        # immutable=1: el archivo nunca se modifica en sitio, sólo se reemplaza
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.version = self.meta.get("version")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def match(self, ecosystem: str, name: str, version: str) -> List[Dict[str, Any]]:
+        """Avisos que afectan a una versión concreta de un paquete"""
+        rows = self._conn.execute(
+            "SELECT a.advisory_id, a.introduced, a.fixed, a.last_affected, a.versions, "
+            "d.summary, d.severity, d.aliases "
+            "FROM affected a JOIN advisories d ON d.id = a.advisory_id "
+            "WHERE a.ecosystem = ? AND a.package = ?",
+            (ecosystem, normalize_name(ecosystem, name))
+        ).fetchall()
+        if not rows:
+            return []
+        key = version_key(version)
+        matches = {}
+        for advisory_id, introduced, fixed, last_affected, versions, summary, severity, aliases in rows:
+            if advisory_id in matches:
+                continue
+            if version in json.loads(versions) or self._in_range(key, introduced, fixed, last_affected):
+                matches[advisory_id] = {
+                    "id": advisory_id,
+                    "summary": summary,
+                    "severity": severity,
+                    "aliases": json.loads(aliases),
+                    "fixed": fixed
+                }
+        return list(matches.values())
+
+    @staticmethod
+    def _in_range(key: tuple, introduced: Optional[str], fixed: Optional[str], last_affected: Optional[str]) -> bool:
+        if introduced is None:
+            return False
+        if introduced != "0" and key < version_key(introduced):
+            return False
+        if fixed is not None:
+            return key < version_key(fixed)
+        if last_affected is not None:
+            return key <= version_key(last_affected)
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser("fetch", help="descargar volcados de OSV y reconstruir el índice")
+    fetch.add_argument("ecosystems", nargs="*", default=["PyPI", "npm"])
+    build = commands.add_parser("build", help="reconstruir el índice desde volcados locales")
+    build.add_argument("sources", nargs="+")
+    commands.add_parser("stats", help="mostrar la versión del índice")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "fetch":
+        print(json.dumps(build_index(fetch_dumps(args.ecosystems))))
+    elif args.command == "build":
+        print(json.dumps(build_index(args.sources)))
+    else:
+        try:
+            with AdvisoryIndex() as index:
+                print(json.dumps(index.meta, indent=2))
+        except AdvisoryIndexError as e:
+            parser.exit(1, f"error: {e}\n")
+
+if __name__ == "__main__":
+    main()
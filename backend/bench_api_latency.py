@@ -0,0 +1,150 @@
+"""Benchmark: latencia de endpoints baratos mientras se atienden consultas pesadas
+
+Crea una base de datos SQLite temporal con un escaneo grande y mide, en el
+mismo bucle de eventos, la latencia de GET /scan/{id} (una fila por clave)
+mientras otros clientes piden sin parar una página de hallazgos filtrada por
+una herramienta que no aparece (SQLite recorre todos los hallazgos del
+escaneo grande). Dos variantes de los mismos endpoints:
+
+  - sync:  sesión síncrona dentro de un endpoint async (el camino anterior):
+           cada consulta pesada bloquea el bucle y retrasa todas las demás
+  - async: AsyncSession y los servicios Async* (aiosqlite): el bucle sigue
+           atendiendo peticiones mientras la consulta pesada se ejecuta
+
+Uso:
+    python bench_api_latency.py [--findings 500000] [--requests 300] [--heavy-clients 2]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from bench_findings import synthetic_findings
+from database import make_async_engine, make_engine
+from migrations import migrate
+from services import AsyncFindingService, AsyncScanService, FindingService, ScanService
+
+def build_app(path: str):
+    """Aplicación con los dos endpoints en variante síncrona y asíncrona"""
+    sync_engine = make_engine(f"sqlite:///{path}")
+    async_engine = make_async_engine(f"sqlite+aiosqlite:///{path}")
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    def sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync/scan/{scan_id}")
+    async def sync_scan(scan_id: str, db: Session = Depends(sync_db)):
+        scan = ScanService.get_scan(db, scan_id)
+        if not scan:
+            raise HTTPException(status_code=404)
+        return {"scan_id": scan.scan_id, "status": scan.status}
+
+    @app.get("/sync/findings/{scan_id}")
+    async def sync_findings(scan_id: str, tool: str, db: Session = Depends(sync_db)):
+        return FindingService.get_findings_page(db, scan_id, 100, tool=tool)[0]
+
+    @app.get("/async/scan/{scan_id}")
+    async def async_scan(scan_id: str, db: AsyncSession = Depends(async_db)):
+        scan = await AsyncScanService.get_scan(db, scan_id)
+        if not scan:
+            raise HTTPException(status_code=404)
+        return {"scan_id": scan.scan_id, "status": scan.status}
+
+    @app.get("/async/findings/{scan_id}")
+    async def async_findings(scan_id: str, tool: str, db: AsyncSession = Depends(async_db)):
+        return (await AsyncFindingService.get_findings_page(db, scan_id, 100, tool=tool))[0]
+
+    return app, sync_engine, async_engine
+
+def seed(path: str, findings: int):
+    seed_engine = make_engine(f"sqlite:///{path}")
+    migrate(seed_engine)
+    db = sessionmaker(bind=seed_engine)()
+    try:
+        ScanService.create_scan(db, "large", "docker", "bench:latest")
+        ScanService.update_scan_results(db, "large", synthetic_findings(findings), {"total_findings": findings})
+        ScanService.create_scan(db, "small", "sast", "/src")
+    finally:
+        db.close()
+        seed_engine.dispose()
+
+async def measure(app, mode: str, requests: int, heavy_clients: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        done = asyncio.Event()
+        heavy_latencies = []
+
+        async def heavy():
+            while not done.is_set():
+                start = time.perf_counter()
+                response = await client.get(f"/{mode}/findings/large", params={"tool": "none"})
+                response.raise_for_status()
+                heavy_latencies.append(time.perf_counter() - start)
+
+        heavy_tasks = [asyncio.create_task(heavy()) for _ in range(heavy_clients)]
+        await asyncio.sleep(0.2)
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get(f"/{mode}/scan/small")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.005)
+        done.set()
+        await asyncio.gather(*heavy_tasks)
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "heavy": statistics.median(heavy_latencies) * 1000 if heavy_latencies else 0.0
+    }
+
+async def run(path: str, requests: int, heavy_clients: int):
+    app, sync_engine, async_engine = build_app(path)
+    try:
+        print(f"{'mode':<8}{'cheap p50 ms':>14}{'cheap p99 ms':>14}{'heavy p50 ms':>14}")
+        for mode in ("sync", "async"):
+            result = await measure(app, mode, requests, heavy_clients)
+            print(f"{mode:<8}{result['p50']:>14.1f}{result['p99']:>14.1f}{result['heavy']:>14.1f}")
+    finally:
+        sync_engine.dispose()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--findings", type=int, default=500000, help="hallazgos del escaneo grande")
+    parser.add_argument("--requests", type=int, default=300, help="peticiones baratas medidas")
+    parser.add_argument("--heavy-clients", type=int, default=2, help="clientes pidiendo la consulta pesada")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-api-")
+    try:
+        path = os.path.join(directory, "bench.db")
+        seed(path, args.findings)
+        asyncio.run(run(path, args.requests, args.heavy_clients))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark: escaneos completándose a la vez contra cada backend de base de datos
+
+Crea N escaneos y mide cuánto tardan en completarse todos a la vez, cada uno
+en su propio hilo: pasar a "running" y guardar sus hallazgos. Cuenta los
+escaneos que fallan (p. ej. "database is locked"). Backends:
+
+  - sqlite-legacy: la configuración anterior (journal por defecto, sin pragmas)
+  - sqlite:        make_engine (WAL, synchronous=NORMAL, busy_timeout, mmap, pool)
+  - postgresql:    make_engine con --postgres-url (usar una base de datos vacía
+                   de pruebas: el benchmark crea las tablas y borra sus escaneos)
+
+y dos caminos de escritura:
+
+  - direct: una sesión por escaneo y un commit por operación (lo que hacía
+            run_security_scan antes de ScanWriter)
+  - writer: las escrituras se encolan en un ScanWriter, que agrupa los
+            cambios pequeños en transacciones conjuntas
+
+Uso:
+    python bench_db.py [--scans 1 8 32 64] [--findings 200] [--postgres-url postgresql://...]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bench_findings import synthetic_findings
+from database import Finding, Scan, make_engine
+from migrations import migrate
+from services import ScanService
+from writer import ScanWriter
+
+def complete_direct(Session, writer, scan_id: str, findings: int):
+    db = Session()
+    try:
+        ScanService.update_scan_status(db, scan_id, "running")
+        ScanService.update_scan_results(db, scan_id, synthetic_findings(findings), {"total_findings": findings})
+    finally:
+        db.close()
+
+def complete_writer(Session, writer, scan_id: str, findings: int):
+    writer.update_status(scan_id, "running").result()
+    writer.save_results(scan_id, synthetic_findings(findings), {"total_findings": findings}).result()
+
+def run(build_engine, path: str, scans: int, findings: int) -> dict:
+    """Completar `scans` escaneos concurrentes y devolver tiempo y errores"""
+    engine = build_engine()
+    migrate(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    scan_ids = [f"{prefix}-{index}" for index in range(scans)]
+    db = Session()
+    try:
+        for scan_id in scan_ids:
+            ScanService.create_scan(db, scan_id, "sca", "/src")
+    finally:
+        db.close()
+
+    writer = ScanWriter(session_factory=Session) if path == "writer" else None
+    complete = complete_writer if writer else complete_direct
+    errors = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=scans) as pool:
+        futures = [pool.submit(complete, Session, writer, scan_id, findings) for scan_id in scan_ids]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(str(e).splitlines()[0])
+    elapsed = time.perf_counter() - start
+    if writer:
+        writer.shutdown()
+
+    db = Session()
+    try:
+        completed = db.query(Scan).filter(Scan.scan_id.like(f"{prefix}-%"), Scan.status == "completed").count()
+        db.query(Finding).filter(Finding.scan_id.like(f"{prefix}-%")).delete(synchronize_session=False)
+        db.query(Scan).filter(Scan.scan_id.like(f"{prefix}-%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+    return {"seconds": elapsed, "completed": completed, "errors": errors}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, nargs="+", default=[1, 8, 32, 64], help="escaneos completándose a la vez")
+    parser.add_argument("--findings", type=int, default=200, help="hallazgos por escaneo")
+    parser.add_argument("--postgres-url", help="URL de una base de datos PostgreSQL de pruebas")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-db-")
+    try:
+        backends = [
+            ("sqlite-legacy", ["direct"], lambda: create_engine(
+                f"sqlite:///{os.path.join(directory, 'legacy.db')}", connect_args={"check_same_thread": False}
+            )),
+            ("sqlite", ["direct", "writer"], lambda: make_engine(f"sqlite:///{os.path.join(directory, 'tuned.db')}")),
+        ]
+        if args.postgres_url:
+            backends.append(("postgresql", ["direct", "writer"], lambda: make_engine(args.postgres_url)))
+
+        print(f"{'backend':<15}{'path':<8}{'scans':>6}{'completed':>10}{'errors':>8}{'seconds':>10}{'scans/s':>10}")
+        for name, paths, build in backends:
+            for path in paths:
+                for scans in args.scans:
+                    result = run(build, path, scans, args.findings)
+                    print(
+                        f"{name:<15}{path:<8}{scans:>6}{result['completed']:>10}{len(result['errors']):>8}"
+                        f"{result['seconds']:>10.2f}{result['completed'] / result['seconds']:>10.1f}"
+                    )
+                    for error in sorted(set(result["errors"])):
+                        print(f"  {error}")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark: persistencia de hallazgos con ScanService.update_scan_results
+
+Crea una base de datos SQLite temporal y guarda N hallazgos sintéticos
+(con forma de hallazgo de Trivy) en un escaneo, midiendo filas por segundo:
+
+  - bulk: ingesta por lotes (INSERT executemany, un commit por lote)
+  - orm:  un objeto Finding por hallazgo y db.add (el camino anterior),
+          sólo hasta --orm-max hallazgos
+
+Uso:
+    python bench_findings.py [--counts 10000 100000 1000000] [--chunk-size 5000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Finding
+from services import ScanService
+
+SEVERITIES = ["critical", "high", "medium", "low"]
+
+def synthetic_findings(count: int):
+    for index in range(count):
+        yield {
+            "tool": "Trivy",
+            "severity": SEVERITIES[index % len(SEVERITIES)],
+            "category": "Dependency Vulnerability",
+            "description": f"Synthetic vulnerability {index} in a transitive dependency",
+            "location": f"usr/lib/python3/site-packages - package-{index % 5000}",
+            "solution": f"{index % 7}.{index % 11}.1",
+            "cve_id": f"CVE-2024-{index:07d}"
+        }
+
+def run(engine_name: str, count: int, chunk_size: int, directory: str) -> float:
+    """Guardar `count` hallazgos y devolver filas por segundo"""
+    path = os.path.join(directory, f"{engine_name}-{count}.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        ScanService.create_scan(db, "bench", "docker", "bench:latest")
+        start = time.perf_counter()
+        if engine_name == "bulk":
+            ScanService.update_scan_results(db, "bench", synthetic_findings(count), {"total_findings": count}, chunk_size)
+        else:
+            for finding in synthetic_findings(count):
+                db.add(Finding(scan_id="bench", **finding))
+            db.commit()
+        elapsed = time.perf_counter() - start
+        assert db.query(Finding).count() == count
+        return count / elapsed
+    finally:
+        db.close()
+        engine.dispose()
+        os.unlink(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--orm-max", type=int, default=100000, help="número máximo de hallazgos para el camino ORM")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-findings-")
+    try:
+        print(f"{'engine':<8}{'findings':>10}{'rows/s':>12}")
+        for count in args.counts:
+            for engine_name in ("bulk", "orm"):
+                if engine_name == "orm" and count > args.orm_max:
+                    continue
+                print(f"{engine_name:<8}{count:>10}{run(engine_name, count, args.chunk_size, directory):>12.0f}")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
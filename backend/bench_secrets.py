@@ -0,0 +1,98 @@
+"""Benchmark: motor de secretos nativo vs Gitleaks sobre un árbol grande
+
+Genera un árbol sintético de archivos de código (con algunos secretos
+plantados) y lo escanea con cada motor, midiendo el tiempo total y los
+hallazgos:
+
+  - native:   NativeSecretsScanner (mmap + prefiltro + pool de procesos)
+  - native-1: el mismo motor en un solo proceso
+  - gitleaks: gitleaks detect --no-git (si está en el PATH)
+
+Uso:
+    python bench_secrets.py [--files 20000] [--file-kb 16] [--tree ruta]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import string
+import tempfile
+import time
+
+SECRETS = [
+    'aws_key = "AKIA{}"',
+    'token = "ghp_{}"',
+    'DB_PASSWORD = "{}"',
+]
+
+def generate_tree(path: str, files: int, file_kb: int):
+    """Escribir `files` archivos de ~file_kb KB; uno de cada 50 lleva un secreto"""
+    rng = random.Random(42)
+    words = ["def", "return", "value", "config", "user", "request", "result", "self", "import", "data"]
+    for index in range(files):
+        directory = os.path.join(path, f"pkg{index // 500}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        size = 0
+        while size < file_kb * 1024:
+            line = "    " + " ".join(rng.choice(words) for _ in range(10))
+            lines.append(line)
+            size += len(line) + 1
+        if index % 50 == 0:
+            template = SECRETS[index // 50 % len(SECRETS)]
+            alphabet = string.ascii_uppercase + string.digits if "AKIA" in template else string.ascii_letters + string.digits
+            length = 16 if "AKIA" in template else 36
+            lines.insert(len(lines) // 2, template.format("".join(rng.choice(alphabet) for _ in range(length))))
+        with open(os.path.join(directory, f"module_{index}.py"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+def run_engine(name: str, tree: str) -> dict:
+    from scanners import GitleaksScanner, NativeSecretsScanner
+    if name == "native":
+        scanner = NativeSecretsScanner()
+    elif name == "native-1":
+        scanner = NativeSecretsScanner(jobs=1)
+    else:
+        scanner = GitleaksScanner(timeout=3600)
+    start = time.perf_counter()
+    result = asyncio.run(scanner.scan_async(tree, "secrets"))
+    elapsed = time.perf_counter() - start
+    if result["status"] != "completed":
+        return {"engine": name, "error": result.get("message")}
+    return {"engine": name, "findings": result["summary"]["total_findings"], "seconds": round(elapsed, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="número de archivos del árbol sintético")
+    parser.add_argument("--file-kb", type=int, default=16, help="tamaño aproximado de cada archivo")
+    parser.add_argument("--tree", help="escanear un árbol existente en lugar de generarlo")
+    args = parser.parse_args()
+
+    tree = args.tree
+    temp_dir = None
+    if not tree:
+        temp_dir = tempfile.mkdtemp(prefix="bench-secrets-")
+        tree = temp_dir
+        print(f"Generating {args.files} files of ~{args.file_kb} KB...")
+        generate_tree(tree, args.files, args.file_kb)
+
+    try:
+        engines = ["native", "native-1"]
+        if shutil.which("gitleaks"):
+            engines.append("gitleaks")
+        else:
+            print("gitleaks not found in PATH, skipping")
+        print(f"{'engine':<10}{'findings':>10}{'seconds':>10}")
+        for engine in engines:
+            result = run_engine(engine, tree)
+            if "error" in result:
+                print(f"{engine:<10} failed: {result['error']}")
+                continue
+            print(f"{engine:<10}{result['findings']:>10}{result['seconds']:>10}")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
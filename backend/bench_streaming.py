@@ -0,0 +1,117 @@
+"""Benchmark: parseo completo vs parseo incremental de informes de Trivy
+
+Genera un informe sintético de Trivy del tamaño indicado y lo procesa en
+procesos separados con cada estrategia, midiendo tiempo y pico de RSS:
+
+  - load:    leer todo el informe en un string y llamar a parse_results
+             (lo que hacía el scanner con capture_output)
+  - stream:  TrivyScanner.iter_findings consumiendo hallazgos uno a uno
+  - collect: iter_findings acumulando la lista completa de hallazgos
+             (lo que conserva un escaneo para guardarlo)
+
+Uso:
+    python bench_streaming.py [--size-mb 500] [--report ruta.json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+def generate_report(path: str, size_mb: int):
+    """Escribir un informe de Trivy de ~size_mb MB sin cargarlo en memoria"""
+    target_bytes = size_mb * 1024 * 1024
+    description = "Synthetic vulnerability description used for benchmarking. " * 12
+    written = 0
+    with open(path, "w") as f:
+        f.write('{"SchemaVersion": 2, "ArtifactName": "bench:latest", "ArtifactType": "container_image",')
+        f.write('"Metadata": {"OS": {"Family": "debian", "Name": "12.5"}}, "Results": [')
+        target_index = 0
+        while written < target_bytes:
+            if target_index:
+                f.write(",")
+            f.write(json.dumps({"Target": f"layer-{target_index}", "Class": "os-pkgs", "Type": "debian"})[:-1])
+            f.write(', "Vulnerabilities": [')
+            for i in range(10000):
+                vuln = {
+                    "VulnerabilityID": f"CVE-2024-{target_index:03d}{i:05d}",
+                    "PkgName": f"package-{i % 500}",
+                    "InstalledVersion": "1.0.0-1",
+                    "FixedVersion": "1.0.1-1",
+                    "Severity": ["CRITICAL", "HIGH", "MEDIUM", "LOW"][i % 4],
+                    "Title": f"Issue {i} in package-{i % 500}",
+                    "Description": description,
+                    "References": [f"https://example.com/advisory/{i}"] * 4
+                }
+                chunk = ("," if i else "") + json.dumps(vuln)
+                f.write(chunk)
+                written += len(chunk)
+                if written >= target_bytes:
+                    break
+            f.write("]}")
+            target_index += 1
+        f.write("]}")
+
+def run_mode(mode: str, path: str):
+    """Ejecutar una estrategia en este proceso e imprimir las métricas en JSON"""
+    from scanners import TrivyScanner
+    scanner = TrivyScanner()
+    start = time.perf_counter()
+    if mode == "load":
+        with open(path, "r") as f:
+            raw_output = f.read()
+        count = len(scanner.parse_results(raw_output))
+    elif mode == "stream":
+        count = 0
+        with open(path, "rb") as f:
+            for _ in scanner.iter_findings(f):
+                count += 1
+    else:
+        with open(path, "rb") as f:
+            count = len(list(scanner.iter_findings(f)))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "findings": count, "seconds": round(elapsed, 2), "peak_rss_mb": round(peak_kb / 1024, 1)}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=500, help="tamaño del informe sintético")
+    parser.add_argument("--report", help="usar un informe existente en lugar de generarlo")
+    parser.add_argument("--run", choices=["load", "stream", "collect"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run, args.report)
+        return
+
+    report = args.report
+    temp_dir = None
+    if not report:
+        temp_dir = tempfile.mkdtemp(prefix="bench-trivy-")
+        report = os.path.join(temp_dir, "report.json")
+        print(f"Generating {args.size_mb} MB synthetic Trivy report...")
+        generate_report(report, args.size_mb)
+
+    try:
+        print(f"Report: {report} ({os.path.getsize(report) / 1024 / 1024:.0f} MB)")
+        print(f"{'mode':<10}{'findings':>12}{'seconds':>10}{'peak RSS MB':>14}")
+        for mode in ["load", "stream", "collect"]:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run", mode, "--report", report],
+                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            if output.returncode != 0:
+                print(f"{mode:<10} failed: {output.stderr.strip().splitlines()[-1]}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{mode:<10}{result['findings']:>12}{result['seconds']:>10}{result['peak_rss_mb']:>14}")
+    finally:
+        if temp_dir:
+            os.unlink(report)
+            os.rmdir(temp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from scanners import SecurityScanner, run_command
+from storage import hash_file, tree_digest
+
+logger = logging.getLogger(__name__)
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+async def image_digest(image: str) -> Optional[str]:
+    """Obtener el ID de contenido de una imagen Docker local"""
+    try:
+        result = await run_command(["docker", "image", "inspect", "--format", "{{.Id}}", image], timeout=30)
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.debug(f"Could not inspect image {image}: {str(e)}")
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+async def target_digest(scan_type: str, target: str) -> Optional[str]:
+    """Obtener el digest del objetivo: imagen Docker, archivo o árbol de directorios"""
+    if scan_type == "docker":
+        return await image_digest(target)
+    if os.path.isfile(target):
+        return "file:" + await asyncio.to_thread(hash_file, target)
+    if os.path.isdir(target):
+        return "tree:" + await asyncio.to_thread(tree_digest, target)
+    return None
+
+class ScanResultCache:
+    """Caché LRU de resultados de escaneo direccionada por contenido
+
+    La clave combina el tipo de escaneo, el digest del objetivo, la versión de
+    la herramienta y su configuración de reglas, así que un cambio en el
+    binario (o en la base de datos de Trivy) invalida las entradas solo.
+    El tamaño se limita por número de entradas y por hallazgos totales.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_findings: Optional[int] = None):
+        self.max_entries = max_entries or _env_int("SCAN_CACHE_MAX_ENTRIES", 256)
+        self.max_findings = max_findings or _env_int("SCAN_CACHE_MAX_FINDINGS", 500000)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._findings = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(scan_type: str, digest: str, tool_version: str, rule_config: str) -> str:
+        """Construir la clave de caché"""
+        raw = "\0".join([scan_type, digest, tool_version, rule_config])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtener un resultado y marcarlo como usado recientemente"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {**entry, "summary": dict(entry["summary"])}
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Guardar un resultado completado, expulsando los menos usados si hace falta"""
+        size = len(result.get("findings", []))
+        if size > self.max_findings:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._findings -= len(previous["findings"])
+            self._entries[key] = {
+                "status": result["status"],
+                "tool": result.get("tool"),
+                "findings": list(result.get("findings", [])),
+                "summary": dict(result.get("summary", {}))
+            }
+            self._findings += size
+            while len(self._entries) > self.max_entries or self._findings > self.max_findings:
+                _, evicted = self._entries.popitem(last=False)
+                self._findings -= len(evicted["findings"])
+                self.evictions += 1
+
+    def clear(self):
+        """Vaciar la caché"""
+        with self._lock:
+            self._entries.clear()
+            self._findings = 0
+
+    def stats(self) -> dict:
+        """Estadísticas de aciertos, fallos y ocupación"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "findings": self._findings,
+                "max_entries": self.max_entries,
+                "max_findings": self.max_findings,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    async def key_for(self, scanner: SecurityScanner, scan_type: str, target: str) -> Optional[str]:
+        """Calcular la clave para un escaneo (None si el objetivo o la versión no se conocen)"""
+        digest = await scanner.pin_digest(scan_type, target) or await target_digest(scan_type, target)
+        if digest is None:
+            return None
+        version = await scanner.tool_version()
+        if version is None:
+            return None
+        return self.make_key(scan_type, digest, version, scanner.rule_config)
+
+    async def run_cached(
+        self,
+        scanner: SecurityScanner,
+        target: str,
+        scan_type: str,
+        scan: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """Ejecutar el escaneo o devolver el resultado cacheado (summary.cache_hit)
+
+        `scan` sustituye a scanner.scan_async cuando hay que preparar el
+        objetivo (p. ej. extraer un archivo comprimido); sólo se llama si no
+        hay resultado en caché.
+        """
+        key = await self.key_for(scanner, scan_type, target)
+        if key is not None:
+            cached = self.get(key)
+            if cached is not None:
+                cached["summary"]["cache_hit"] = True
+                return cached
+
+        result = await (scan() if scan is not None else scanner.scan_async(target, scan_type))
+        # Los resultados parciales (p. ej. shards fallidos) no se cachean
+        if key is not None and result.get("status") == "completed" and not result.get("summary", {}).get("incomplete"):
+            self.put(key, result)
+        if result.get("status") == "completed":
+            result.setdefault("summary", {})["cache_hit"] = False
+        return result
+
+    async def run_cached_batch(self, scanner: SecurityScanner, targets: List[str], scan_type: str) -> Dict[str, Dict[str, Any]]:
+        """Como run_cached para un lote: sólo los objetivos sin caché pasan por scan_batch_async"""
+        keys = {}
+        results = {}
+        for target in dict.fromkeys(targets):
+            keys[target] = await self.key_for(scanner, scan_type, target)
+            cached = self.get(keys[target]) if keys[target] is not None else None
+            if cached is not None:
+                cached["summary"]["cache_hit"] = True
+                results[target] = cached
+
+        misses = [target for target in keys if target not in results]
+        if misses:
+            for target, result in (await scanner.scan_batch_async(misses)).items():
+                if result.get("status") == "completed":
+                    if keys[target] is not None and not result.get("summary", {}).get("incomplete"):
+                        self.put(keys[target], result)
+                    result.setdefault("summary", {})["cache_hit"] = False
+                results[target] = result
+        return results
+
+# Instancia global de la caché de resultados
+scan_cache = ScanResultCache()
@@ -1,14 +1,87 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, String, Date, DateTime, Text, ForeignKey, Index
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import json
+import os
 
 # Configuración de la base de datos
-DATABASE_URL = "sqlite:///./devsecops.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./devsecops.db")
+
+# SQLite: WAL permite leer mientras otro escaneo escribe y busy_timeout hace
+# esperar a los escritores concurrentes en vez de fallar con "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Pool de conexiones (PostgreSQL y ficheros SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+def engine_options(url: str) -> dict:
+    """Argumentos de create_engine según el backend de la URL"""
+    url = make_url(url)
+    pool = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        # Las bases de datos en memoria usan el pool propio de SQLAlchemy
+        if url.database and url.database != ":memory:" and url.query.get("mode") != "memory":
+            options.update(pool)
+        return options
+    return {**pool, "pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": True}
+
+def make_engine(url: str = DATABASE_URL) -> Engine:
+    """Crear el engine de `url` (SQLite con WAL y pragmas, o PostgreSQL con pool)"""
+    new_engine = create_engine(url, **engine_options(url))
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", _set_sqlite_pragmas)
+    return new_engine
+
+# Drivers asíncronos de los endpoints para cada backend
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """URL equivalente a `url` con el driver asíncrono de su backend"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+def make_async_engine(url: str = ASYNC_DATABASE_URL, **options) -> AsyncEngine:
+    """Engine asíncrono (aiosqlite/asyncpg) con la misma configuración que make_engine"""
+    new_engine = create_async_engine(url, **{**engine_options(url), **options})
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return new_engine
+
+# Sesiones síncronas: escaneos en segundo plano, migraciones y comandos
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sesiones asíncronas: endpoints de la API (no bloquean el bucle de eventos)
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 class Scan(Base):
@@ -19,7 +92,7 @@ class Scan(Base):
     scan_type = Column(String, nullable=False)
     target = Column(String, nullable=False)
     status = Column(String, nullable=False, default="pending")
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     results_summary = Column(Text)  # JSON string
     
     # Relación con findings
@@ -42,21 +115,43 @@ class Finding(Base):
     __tablename__ = "findings"
     
     id = Column(Integer, primary_key=True, index=True)
-    scan_id = Column(String, ForeignKey("scans.scan_id"))
+    scan_id = Column(String, ForeignKey("scans.scan_id"), index=True)
     tool = Column(String, nullable=False)
-    severity = Column(String, nullable=False)
+    severity = Column(String, nullable=False, index=True)
     category = Column(String)
     description = Column(Text, nullable=False)
     location = Column(String)
     solution = Column(Text)
-    cve_id = Column(String)
+    cve_id = Column(String, index=True)
+    
+    # Hallazgos de un escaneo filtrados (u ordenados por grupo) por severidad
+    __table_args__ = (Index("ix_findings_scan_id_severity", "scan_id", "severity"),)
     
     # Relación con scan
     scan = relationship("Scan", back_populates="findings")
 
-# Crear las tablas
+# Rollups: contadores agregados que ScanService mantiene al crear y completar
+# escaneos (en la misma transacción); se reconstruyen con `python rollups.py rebuild`
+class ScanRollup(Base):
+    __tablename__ = "scan_rollups"
+    
+    day = Column(Date, primary_key=True)  # Día del escaneo (UTC)
+    scan_type = Column(String, primary_key=True)
+    scans = Column(Integer, nullable=False, default=0)
+
+class FindingRollup(Base):
+    __tablename__ = "finding_rollups"
+    
+    day = Column(Date, primary_key=True)  # Día del escaneo al que pertenecen los hallazgos
+    scan_type = Column(String, primary_key=True)
+    tool = Column(String, primary_key=True)
+    severity = Column(String, primary_key=True)
+    findings = Column(Integer, nullable=False, default=0)
+
+# Crear las tablas y aplicar las migraciones pendientes (ver migrations.py)
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    from migrations import migrate
+    migrate(engine)
 
 # Dependency para obtener la sesión de base de datos
 def get_db():
@@ -66,3 +161,7 @@ def get_db():
     finally:
         db.close()
 
+# Dependency para obtener la sesión asíncrona de los endpoints
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,319 @@
+import asyncio
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Límites por defecto de escaneos simultáneos por tipo (herramienta)
+DEFAULT_TOOL_LIMITS = {
+    "sast": 4,      # Semgrep
+    "sca": 4,       # Trivy fs
+    "docker": 2,    # Trivy image
+    "secrets": 8,   # Gitleaks
+    "full": 2       # Semgrep + Trivy fs + Gitleaks en paralelo
+}
+
+def _env_int(name: str, default: int) -> int:
+    """Leer un entero de una variable de entorno"""
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+def default_max_workers() -> int:
+    """Calcular cuántos escaneos pueden ejecutarse a la vez según CPUs y memoria"""
+    cpus = os.cpu_count() or 1
+    memory_per_scan_mb = max(1, _env_int("SCAN_MEMORY_PER_WORKER_MB", 512))
+    try:
+        total_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return cpus
+    return max(1, min(cpus, total_mb // memory_per_scan_mb))
+
+def _env_float(name: str, default: float) -> float:
+    """Leer un número decimal de una variable de entorno"""
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+def load_tool_limits() -> Dict[str, int]:
+    """Cargar límites por tipo de escaneo (SCAN_LIMIT_SAST, SCAN_LIMIT_DOCKER, ...)"""
+    return {
+        scan_type: max(1, _env_int(f"SCAN_LIMIT_{scan_type.upper()}", limit))
+        for scan_type, limit in DEFAULT_TOOL_LIMITS.items()
+    }
+
+class ScanQueueFullError(Exception):
+    """La cola de escaneos pendientes está llena"""
+
+class ScanJob:
+    """Escaneo en cola o en ejecución"""
+
+    def __init__(self, scan_id: str, scan_type: str, target: str, options: Optional[Dict[str, Any]] = None):
+        self.scan_id = scan_id
+        self.scan_type = scan_type
+        self.target = target
+        self.options = options or {}
+        self.enqueued_at = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+        self.released = False
+        # Escaneos que comparten plaza con éste (el primero es el que la ocupa)
+        self.batch: List["ScanJob"] = [self]
+
+class ScanExecutor:
+    """Ejecutor de escaneos con cola acotada y concurrencia limitada por herramienta
+
+    Los escaneos son corutinas supervisadas por un único event loop propio
+    (en un hilo aparte); el número de escaneos simultáneos se dimensiona según
+    la máquina. Un escaneo sólo arranca cuando hay una plaza libre y su
+    herramienta no alcanzó su límite; mientras tanto permanece en cola con
+    estado `pending`. El pool de hilos sólo se usa para el trabajo bloqueante
+    de los runners (base de datos, alertas).
+
+    Si se indica `batch_runner`, los escaneos pendientes para los que
+    `batch_key` devuelve la misma clave se agrupan: el primero espera hasta
+    `batch_window` segundos a que lleguen otros y el lote (hasta `batch_max`
+    escaneos) se ejecuta con una sola llamada a `batch_runner`, ocupando una
+    única plaza de su herramienta.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[str, str, str, Dict[str, Any]], Awaitable[None]],
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        tool_limits: Optional[Dict[str, int]] = None,
+        batch_runner: Optional[Callable[[List[ScanJob]], Awaitable[None]]] = None,
+        batch_key: Optional[Callable[[ScanJob], Optional[str]]] = None,
+        batch_window: Optional[float] = None,
+        batch_max: Optional[int] = None
+    ):
+        self.runner = runner
+        self.batch_runner = batch_runner
+        self.batch_key = batch_key if batch_runner else None
+        self.batch_window = batch_window if batch_window is not None else _env_float("SCAN_BATCH_WINDOW", 0.5)
+        self.batch_max = batch_max or max(1, _env_int("SCAN_BATCH_MAX", 16))
+        self.max_workers = max_workers or _env_int("SCAN_MAX_WORKERS", 0) or default_max_workers()
+        self.max_queue = max_queue or _env_int("SCAN_QUEUE_SIZE", 100)
+        self.tool_limits = tool_limits or load_tool_limits()
+
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._running: Dict[str, ScanJob] = {}
+        self._active: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def start(self):
+        """Arrancar el hilo del despachador (idempotente)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._loop = asyncio.new_event_loop()
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scan-worker")
+            self._loop.set_default_executor(self._pool)
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop, args=(ready,), name="scan-executor", daemon=True
+            )
+            self._thread.start()
+        ready.wait()
+        logger.info(
+            f"Scan executor started: {self.max_workers} workers, "
+            f"queue size {self.max_queue}, limits {self.tool_limits}"
+        )
+
+    def shutdown(self):
+        """Detener el despachador; los escaneos en cola se descartan"""
+        with self._lock:
+            if self._thread is None:
+                return
+            thread, loop = self._thread, self._loop
+            self._stopping = True
+            self._pending.clear()
+        loop.call_soon_threadsafe(self._wakeup.set)
+        thread.join(timeout=10)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        loop.close()
+        with self._lock:
+            self._thread = None
+            self._loop = None
+
+    def is_full(self) -> bool:
+        """Indicar si la cola de pendientes está llena"""
+        with self._lock:
+            return len(self._pending) >= self.max_queue
+
+    def submit(self, scan_id: str, scan_type: str, target: str, options: Optional[Dict[str, Any]] = None) -> int:
+        """Encolar un escaneo y devolver su posición en la cola (1 = siguiente)"""
+        self.start()
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                raise ScanQueueFullError(f"Scan queue is full ({self.max_queue} pending scans)")
+            self._pending.append(ScanJob(scan_id, scan_type, target, options))
+            position = len(self._pending)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return position
+
+    def cancel(self, scan_id: str) -> Optional[str]:
+        """Cancelar un escaneo en cola o en ejecución
+
+        Devuelve el estado en que se encontraba ("pending" o "running") o None
+        si el ejecutor no lo conoce. La plaza de un escaneo en ejecución se
+        libera de inmediato; su proceso se termina de forma asíncrona.
+        """
+        with self._lock:
+            for job in self._pending:
+                if job.scan_id == scan_id:
+                    self._pending.remove(job)
+                    return "pending"
+            job = self._running.pop(scan_id, None)
+            if job is None:
+                return None
+            job.cancelled = True
+            # Un lote sigue en marcha mientras le quede algún escaneo sin cancelar
+            if not all(other.cancelled for other in job.batch):
+                return "running"
+            self._release(job.batch[0])
+        if job.task is not None:
+            self._loop.call_soon_threadsafe(job.task.cancel)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return "running"
+
+    def queue_position(self, scan_id: str) -> Optional[int]:
+        """Obtener la posición en cola de un escaneo pendiente"""
+        with self._lock:
+            for index, job in enumerate(self._pending):
+                if job.scan_id == scan_id:
+                    return index + 1
+        return None
+
+    def active_targets(self) -> Set[str]:
+        """Objetivos de los escaneos en cola o en ejecución"""
+        with self._lock:
+            return {job.target for job in self._pending} | {job.target for job in self._running.values()}
+
+    def stats(self) -> dict:
+        """Estado actual de la cola y de los workers"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "tool_limits": dict(self.tool_limits),
+                "queued": len(self._pending),
+                "running": len(self._running),
+                "batch_window": self.batch_window if self.batch_runner else None,
+                "running_by_type": {k: v for k, v in self._active.items() if v}
+            }
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._loop.call_soon(ready.set)
+        self._loop.run_until_complete(self._dispatch())
+
+    async def _dispatch(self):
+        """Bucle principal: lanzar los escaneos que tengan capacidad disponible"""
+        tasks = set()
+        while not self._stopping:
+            for job in self._take_ready_jobs():
+                task = asyncio.ensure_future(self._execute(job))
+                for member in job.batch:
+                    member.task = task
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await self._wakeup.wait()
+            self._wakeup.clear()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _take_ready_jobs(self) -> List[ScanJob]:
+        """Sacar de la cola los escaneos (o lotes) que pueden arrancar ahora, en orden de llegada"""
+        ready = []
+        wait = None
+        now = time.monotonic()
+        with self._lock:
+            taken = set()
+            for job in list(self._pending):
+                if job.scan_id in taken:
+                    continue
+                if sum(self._active.values()) >= self.max_workers:
+                    break
+                limit = self.tool_limits.get(job.scan_type, self.max_workers)
+                if self._active.get(job.scan_type, 0) >= limit:
+                    continue
+                batch = self._collect_batch(job)
+                if self._batchable(job):
+                    remaining = job.enqueued_at + self.batch_window - now
+                    if len(batch) < self.batch_max and remaining > 0:
+                        # Esperar a que se acumulen más escaneos compatibles
+                        wait = remaining if wait is None else min(wait, remaining)
+                        taken.update(member.scan_id for member in batch)
+                        continue
+                for member in batch:
+                    self._pending.remove(member)
+                    self._running[member.scan_id] = member
+                    member.batch = batch
+                    taken.add(member.scan_id)
+                self._active[job.scan_type] = self._active.get(job.scan_type, 0) + 1
+                ready.append(job)
+        if wait is not None:
+            self._loop.call_later(wait, self._wakeup.set)
+        return ready
+
+    def _batchable(self, job: ScanJob) -> bool:
+        return self.batch_key is not None and self.batch_key(job) is not None
+
+    def _collect_batch(self, job: ScanJob) -> List[ScanJob]:
+        """Escaneos pendientes que pueden ejecutarse junto a `job` (llamar con el lock tomado)"""
+        if self.batch_key is None:
+            return [job]
+        key = self.batch_key(job)
+        if key is None:
+            return [job]
+        batch = [job]
+        for other in self._pending:
+            if len(batch) >= self.batch_max:
+                break
+            if other is not job and other.scan_type == job.scan_type and self.batch_key(other) == key:
+                batch.append(other)
+        return batch
+
+    def _release(self, job: ScanJob):
+        """Liberar la plaza de un escaneo o lote (llamar con el lock tomado)"""
+        if job.released:
+            return
+        job.released = True
+        for member in job.batch:
+            self._running.pop(member.scan_id, None)
+        self._active[job.scan_type] -= 1
+
+    async def _execute(self, job: ScanJob):
+        """Ejecutar un escaneo (o un lote) y liberar su plaza al terminar"""
+        try:
+            if len(job.batch) > 1:
+                await self.batch_runner(job.batch)
+            elif not job.cancelled:
+                await self.runner(job.scan_id, job.scan_type, job.target, job.options)
+        except asyncio.CancelledError:
+            logger.info(f"Scan {job.scan_id} cancelled")
+        except Exception as e:
+            logger.error(f"Unhandled error in scan {job.scan_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._release(job)
+            self._wakeup.set()
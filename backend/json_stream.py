@@ -0,0 +1,212 @@
+import codecs
+import json
+import re
+from typing import Any, Dict, IO, Iterator, List, Sequence, Tuple
+
+# Tamaño de los fragmentos leídos de pipes y archivos
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_NUMBER_START = "-0123456789"
+_NEED_MORE = object()
+_decoder = json.JSONDecoder()
+
+class JSONStreamError(ValueError):
+    """Entrada JSON inválida o truncada"""
+
+class JSONItemStream:
+    """Parser JSON incremental que produce los elementos de una ruta concreta
+
+    La ruta indica cómo llegar a los elementos deseados: claves de objeto y
+    "*" para cada elemento de un array. Por ejemplo ("Results", "*",
+    "Vulnerabilities", "*") produce cada vulnerabilidad de un informe de
+    Trivy. El parser sólo mantiene en memoria el elemento en curso (qué se
+    hace con los elementos completados es cosa del llamador); los valores
+    fuera de la ruta se descartan sin decodificarlos. Junto a cada elemento
+    se devuelve el contexto: los valores escalares que aparecieron antes en
+    los objetos que lo contienen (por ejemplo el "Target" de Trivy).
+
+    Uso: llamar a feed() con cada fragmento de texto y a close() al final;
+    ambos devuelven la lista de (contexto, elemento) completados.
+    """
+
+    def __init__(self, path: Sequence[str]):
+        self._path = tuple(path)
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._done = False
+        self._parser = self._parse_document()
+
+    def feed(self, data: str) -> List[Tuple[Dict[str, Any], Any]]:
+        """Añadir un fragmento de texto y devolver los elementos completados"""
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += data
+        return self._drain()
+
+    def close(self) -> List[Tuple[Dict[str, Any], Any]]:
+        """Indicar el final de la entrada y devolver los elementos restantes"""
+        self._eof = True
+        return self._drain()
+
+    def _drain(self) -> List[Tuple[Dict[str, Any], Any]]:
+        items = []
+        while not self._done:
+            try:
+                event = next(self._parser)
+            except StopIteration:
+                self._done = True
+                break
+            if event is _NEED_MORE:
+                break
+            items.append(event)
+        return items
+
+    def _error(self, message: str) -> JSONStreamError:
+        return JSONStreamError(f"{message} near: {self._buf[self._pos:self._pos + 40]!r}")
+
+    def _skip_whitespace(self):
+        """Avanzar hasta el siguiente carácter significativo y devolverlo"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof:
+                raise self._error("Unexpected end of JSON input")
+            yield _NEED_MORE
+
+    def _expect(self, allowed: str):
+        """Consumir un carácter estructural y devolverlo"""
+        ch = yield from self._skip_whitespace()
+        if ch not in allowed:
+            raise self._error(f"Expected one of {allowed!r}")
+        self._pos += 1
+        return ch
+
+    def _read_value(self):
+        """Decodificar el valor completo que empieza en la posición actual"""
+        yield from self._skip_whitespace()
+        min_size = 0
+        while True:
+            available = len(self._buf) - self._pos
+            if available >= min_size or self._eof:
+                try:
+                    value, end = _decoder.raw_decode(self._buf, self._pos)
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise self._error("Invalid JSON value")
+                    # Esperar al doble de datos para no re-decodificar en cada fragmento
+                    min_size = available * 2
+                else:
+                    # Un número al final del buffer puede continuar en el siguiente fragmento
+                    if end < len(self._buf) or self._eof or self._buf[self._pos] not in _NUMBER_START:
+                        self._pos = end
+                        return value
+            if self._eof:
+                raise self._error("Unexpected end of JSON input")
+            yield _NEED_MORE
+
+    def _skip_value(self):
+        """Descartar el valor actual sin retenerlo en memoria"""
+        ch = yield from self._skip_whitespace()
+        if ch not in "[{":
+            yield from self._read_value()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+            elif match.group() == '"':
+                string = _STRING.match(self._buf, match.start())
+                if string is not None:
+                    self._pos = string.end()
+                    continue
+                # Cadena incompleta: esperar al siguiente fragmento
+                self._pos = match.start()
+            else:
+                self._pos = match.end()
+                depth += 1 if match.group() in "[{" else -1
+                if depth == 0:
+                    return
+                continue
+            if self._eof:
+                raise self._error("Unexpected end of JSON input")
+            yield _NEED_MORE
+
+    def _parse_document(self):
+        # Una entrada vacía equivale a un documento sin elementos
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                break
+            if self._eof:
+                return
+            yield _NEED_MORE
+        yield from self._walk(0, {})
+
+    def _walk(self, depth: int, context: Dict[str, Any]):
+        """Recorrer el valor actual siguiendo la ruta a partir de `depth`"""
+        if depth == len(self._path):
+            value = yield from self._read_value()
+            yield (context, value)
+            return
+
+        step = self._path[depth]
+        ch = yield from self._skip_whitespace()
+
+        if step == "*":
+            if ch != "[":
+                yield from self._skip_value()
+                return
+            self._pos += 1
+            ch = yield from self._skip_whitespace()
+            if ch == "]":
+                self._pos += 1
+                return
+            while True:
+                yield from self._walk(depth + 1, context)
+                if (yield from self._expect(",]")) == "]":
+                    return
+
+        if ch != "{":
+            yield from self._skip_value()
+            return
+        self._pos += 1
+        local = dict(context)
+        ch = yield from self._skip_whitespace()
+        if ch == "}":
+            self._pos += 1
+            return
+        while True:
+            key = yield from self._read_value()
+            if not isinstance(key, str):
+                raise self._error("Expected object key")
+            yield from self._expect(":")
+            ch = yield from self._skip_whitespace()
+            if key == step:
+                yield from self._walk(depth + 1, local)
+            elif ch in "[{":
+                yield from self._skip_value()
+            else:
+                local[key] = yield from self._read_value()
+            if (yield from self._expect(",}")) == "}":
+                return
+
+def iter_json_items(stream: IO, path: Sequence[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Dict[str, Any], Any]]:
+    """Leer un archivo (texto o binario) por fragmentos y producir los elementos de `path`"""
+    parser = JSONItemStream(path)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        yield from parser.feed(chunk)
+    yield from parser.feed(decoder.decode(b"", final=True))
+    yield from parser.close()
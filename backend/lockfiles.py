@@ -0,0 +1,123 @@
+import json
+import os
+import re
+import tomllib
+import logging
+from typing import Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+class Package(NamedTuple):
+    """Dependencia con versión exacta declarada en un lockfile"""
+    ecosystem: str      # Nombre del ecosistema en OSV: "PyPI", "npm", ...
+    name: str
+    version: str
+    file: str
+
+# Directorios que no contienen lockfiles propios del proyecto
+EXCLUDE_DIRS = {".git", "node_modules", ".venv", "venv", ".tox", "__pycache__"}
+
+_REQUIREMENT = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*===?\s*([^\s;#,]+)")
+
+def _parse_requirements(path: str) -> Iterator[Tuple[str, str, str]]:
+    """requirements*.txt: sólo las dependencias fijadas con =="""
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            match = _REQUIREMENT.match(line)
+            if match:
+                yield "PyPI", match.group(1), match.group(2)
+
+def _parse_package_lock(path: str) -> Iterator[Tuple[str, str, str]]:
+    """package-lock.json / npm-shrinkwrap.json (formatos v1, v2 y v3)"""
+    with open(path, "rb") as f:
+        data = json.load(f)
+    packages = data.get("packages")
+    if isinstance(packages, dict):
+        for location, info in packages.items():
+            if not location or not isinstance(info, dict) or info.get("link"):
+                continue
+            name = info.get("name") or location.rsplit("node_modules/", 1)[-1]
+            if info.get("version"):
+                yield "npm", name, info["version"]
+        return
+
+    def walk(dependencies):
+        for name, info in (dependencies or {}).items():
+            if isinstance(info, dict):
+                if info.get("version") and not info["version"].startswith(("file:", "git", "http")):
+                    yield "npm", name, info["version"]
+                yield from walk(info.get("dependencies"))
+    yield from walk(data.get("dependencies"))
+
+_YARN_ENTRY = re.compile(r'^"?((?:@[^@/"]+/)?[^@"]+)@')
+_YARN_VERSION = re.compile(r'^\s+version:?\s+"?([^"\s]+)"?')
+
+def _parse_yarn_lock(path: str) -> Iterator[Tuple[str, str, str]]:
+    """yarn.lock (v1 y berry)"""
+    name = None
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if not line.startswith((" ", "#", "\n")):
+                match = _YARN_ENTRY.match(line)
+                name = match.group(1) if match else None
+            elif name:
+                match = _YARN_VERSION.match(line)
+                if match:
+                    yield "npm", name, match.group(1)
+                    name = None
+
+def _parse_poetry_lock(path: str) -> Iterator[Tuple[str, str, str]]:
+    """poetry.lock"""
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    for package in data.get("package", []):
+        if package.get("name") and package.get("version"):
+            yield "PyPI", package["name"], package["version"]
+
+def _parse_pipfile_lock(path: str) -> Iterator[Tuple[str, str, str]]:
+    """Pipfile.lock (secciones default y develop)"""
+    with open(path, "rb") as f:
+        data = json.load(f)
+    for section in ("default", "develop"):
+        for name, info in (data.get(section) or {}).items():
+            version = info.get("version", "") if isinstance(info, dict) else ""
+            if version.startswith("=="):
+                yield "PyPI", name, version[2:]
+
+def _parser_for(name: str) -> Callable[[str], Iterator[Tuple[str, str, str]]]:
+    if name.startswith("requirements") and name.endswith(".txt"):
+        return _parse_requirements
+    return {
+        "package-lock.json": _parse_package_lock,
+        "npm-shrinkwrap.json": _parse_package_lock,
+        "yarn.lock": _parse_yarn_lock,
+        "poetry.lock": _parse_poetry_lock,
+        "Pipfile.lock": _parse_pipfile_lock,
+    }.get(name)
+
+def find_lockfiles(target: str) -> List[str]:
+    """Lockfiles soportados en un archivo o directorio"""
+    if os.path.isfile(target):
+        return [target] if _parser_for(os.path.basename(target)) else []
+    paths = []
+    for root, dirs, files in os.walk(target):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDE_DIRS)
+        for name in sorted(files):
+            if _parser_for(name):
+                paths.append(os.path.join(root, name))
+    return paths
+
+def parse_lockfile(path: str) -> List[Package]:
+    """Paquetes de un lockfile (lista vacía si no se puede leer)"""
+    parser = _parser_for(os.path.basename(path))
+    if parser is None:
+        return []
+    try:
+        return [Package(ecosystem, name, version, path) for ecosystem, name, version in parser(path)]
+    except (OSError, ValueError, tomllib.TOMLDecodeError, AttributeError) as e:
+        logger.warning(f"Could not parse lockfile {path}: {str(e)}")
+        return []
+
+def collect_packages(target: str) -> Dict[str, List[Package]]:
+    """Paquetes de todos los lockfiles del objetivo, por archivo"""
+    return {path: parse_lockfile(path) for path in find_lockfiles(target)}
@@ -1,17 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import json
-import os
+from concurrent.futures import Future
 import uuid
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import logging
-from scanners import ScannerFactory
-from database import get_db, create_tables
-from services import ScanService, FindingService, DashboardService
+from contextlib import asynccontextmanager
+from scanners import ScannerFactory, SemgrepScanner, shutdown_secrets_pool
+from database import async_engine, get_async_db, get_db, create_tables
+from services import (
+    AsyncDashboardService, AsyncFindingService, AsyncScanService, RollupService
+)
 from alerts import alert_manager
+from executor import ScanExecutor, ScanJob, ScanQueueFullError
+from writer import ScanWriter
+from cache import scan_cache
+from upload_store import (
+    UPLOAD_PRUNE_INTERVAL, InvalidUploadError, UploadTooLargeError, prune_uploads, save_upload
+)
+import rulepacks
+import sboms
+import workspace
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -20,7 +34,47 @@ logger = logging.getLogger(__name__)
 # Crear tablas al iniciar
 create_tables()
 
-app = FastAPI(title="DevSecOps Platform API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arrancar y detener el ejecutor de escaneos junto con la aplicación"""
+    rule_pack = rulepacks.active_pack()
+    if rule_pack is None:
+        logger.warning("No Semgrep rule pack installed: SAST scans will use --config=auto and need network access")
+    else:
+        logger.info(f"Using Semgrep rule pack {rule_pack.version}")
+    await asyncio.to_thread(workspace.cleanup_stale)
+    if await asyncio.to_thread(_backfill_rollups):
+        logger.info("Dashboard rollups rebuilt from existing scans")
+    scan_writer.start()
+    scan_executor.start()
+    pruner = asyncio.create_task(prune_uploads_periodically())
+    yield
+    pruner.cancel()
+    scan_executor.shutdown()
+    await asyncio.to_thread(scan_writer.shutdown)
+    await asyncio.to_thread(shutdown_secrets_pool)
+    await async_engine.dispose()
+
+def _backfill_rollups() -> bool:
+    """Calcular los rollups de una base de datos creada antes de que existieran"""
+    db = next(get_db())
+    try:
+        return RollupService.backfill_if_empty(db)
+    finally:
+        db.close()
+
+async def prune_uploads_periodically():
+    """Retención de uploads/: borrar lo caducado sin tocar los objetivos de escaneos activos"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(prune_uploads, scan_executor.active_targets())
+            if removed:
+                logger.info(f"Pruned {len(removed)} uploaded files")
+        except Exception as e:
+            logger.error(f"Error pruning uploads: {str(e)}")
+        await asyncio.sleep(UPLOAD_PRUNE_INTERVAL)
+
+app = FastAPI(title="DevSecOps Platform API", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -29,28 +83,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor de paginación de los listados
 )
 
 # Modelos de datos
 class ScanRequest(BaseModel):
-    scan_type: str  # 'sast', 'sca', 'docker', 'secrets'
+    scan_type: str  # 'sast', 'sca', 'docker', 'secrets', 'full'
     target: str  # Ruta del código, nombre de la imagen, etc.
+    options: Optional[Dict[str, Any]] = None  # Opciones del scanner, p. ej. {"incremental": true}
 
 class ScanResponse(BaseModel):
     scan_id: str
     status: str
     message: str
-
-class Finding(BaseModel):
-    id: Optional[int] = None
-    scan_id: str
-    tool: str
-    severity: str
-    category: Optional[str] = None
-    description: str
-    location: Optional[str] = None
-    solution: Optional[str] = None
-    cve_id: Optional[str] = None
+    queue_position: Optional[int] = None
 
 class ScanResult(BaseModel):
     scan_id: str
@@ -58,157 +104,327 @@ class ScanResult(BaseModel):
     timestamp: datetime
     target: str
     status: str
-    findings: List[Finding]
-    summary: dict
+    summary: dict  # Los hallazgos se obtienen paginados en /api/scan/{scan_id}/findings
+    queue_position: Optional[int] = None
 
-def run_security_scan(scan_id: str, scan_type: str, target: str):
-    """Ejecutar escaneo de seguridad en segundo plano"""
-    db = next(get_db())
+async def _write(future: Future) -> Any:
+    """Esperar a que el escritor único aplique una escritura encolada"""
+    return await asyncio.wrap_future(future)
+
+async def _store_scan_result(scan_id: str, scan_type: str, target: str, result: Dict[str, Any]):
+    """Guardar el resultado de un escaneo y enviar alertas si procede"""
+    if result["status"] == "completed":
+        await _write(scan_writer.save_results(scan_id, result.get("findings", []), result.get("summary", {})))
+        
+        # Enviar alertas si hay vulnerabilidades críticas
+        findings = result.get("findings", [])
+        if findings:
+            scan_data = {
+                "scan_id": scan_id,
+                "scan_type": scan_type,
+                "target": target
+            }
+            alert_result = await asyncio.to_thread(alert_manager.send_alert, scan_data, findings)
+            logger.info(f"Alert result: {alert_result}")
+    else:
+        await _write(scan_writer.update_status(scan_id, "failed"))
+    
+    logger.info(f"Completed {scan_type} scan for {target}: {len(result.get('findings', []))} findings")
+
+async def run_security_scan(scan_id: str, scan_type: str, target: str, options: Optional[Dict[str, Any]] = None):
+    """Ejecutar escaneo de seguridad (corutina supervisada por el ejecutor)
+
+    Las escrituras en la base de datos pasan por el escritor único (scan_writer).
+    """
     try:
         logger.info(f"Starting {scan_type} scan for {target}")
         
         # Actualizar estado a "running"
-        ScanService.update_scan_status(db, scan_id, "running")
+        await _write(scan_writer.update_status(scan_id, "running"))
         
         # Crear scanner apropiado
-        scanner = ScannerFactory.create_scanner(scan_type)
+        scanner = ScannerFactory.create_scanner(scan_type, options)
         
-        # Ejecutar escaneo
-        result = scanner.scan(target, scan_type)
+        # Los archivos comprimidos se extraen una vez para todas las herramientas del escaneo
+        scan = None
+        if scan_type != "docker" and workspace.is_archive(target):
+            scan = lambda: workspace.scan_archive(scanner, target, scan_type, scan_id)
         
-        # Actualizar resultados en la base de datos
-        if result["status"] == "completed":
-            ScanService.update_scan_results(
-                db, 
-                scan_id, 
-                result.get("findings", []), 
-                result.get("summary", {})
-            )
-            
-            # Enviar alertas si hay vulnerabilidades críticas
-            findings = result.get("findings", [])
-            if findings:
-                scan_data = {
-                    "scan_id": scan_id,
-                    "scan_type": scan_type,
-                    "target": target
-                }
-                alert_result = alert_manager.send_alert(scan_data, findings)
-                logger.info(f"Alert result: {alert_result}")
-        else:
-            ScanService.update_scan_status(db, scan_id, "failed")
+        # Ejecutar escaneo (subprocesos asyncio, cancelable) o reutilizar la caché
+        result = await scan_cache.run_cached(scanner, target, scan_type, scan)
         
-        logger.info(f"Completed {scan_type} scan for {target}: {len(result.get('findings', []))} findings")
+        # Actualizar resultados en la base de datos
+        await _store_scan_result(scan_id, scan_type, target, result)
         
+    except asyncio.CancelledError:
+        # El escritor aplica las escrituras en orden: "cancelled" queda después de las anteriores
+        logger.info(f"Scan {scan_id} cancelled")
+        await _write(scan_writer.update_status(scan_id, "cancelled"))
+        raise
     except Exception as e:
         logger.error(f"Error in scan {scan_id}: {str(e)}")
-        ScanService.update_scan_status(db, scan_id, "failed")
-    finally:
-        db.close()
+        await _write(scan_writer.update_status(scan_id, "failed"))
 
-@app.get("/")
-async def root():
-    return {"message": "DevSecOps Platform API", "version": "1.0.0"}
+def sast_batch_key(job: ScanJob) -> Optional[str]:
+    """Clave de agrupación: escaneos SAST sin opciones con la misma configuración de reglas
+
+    Los archivos comprimidos no se agrupan: se extraen en su propio espacio de trabajo.
+    """
+    if job.scan_type != "sast" or job.options or workspace.is_archive(job.target):
+        return None
+    return SemgrepScanner().rule_config
 
-@app.post("/api/upload", response_model=dict)
-async def upload_file(file: UploadFile = File(...)):
-    """Subir archivo para escaneo"""
+async def run_sast_batch(jobs: List[ScanJob]):
+    """Ejecutar un lote de escaneos SAST con una sola invocación de Semgrep"""
     try:
-        # Crear directorio de uploads si no existe
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
+        targets = sorted({job.target for job in jobs})
+        logger.info(f"Starting batched sast scan of {len(jobs)} scans over {len(targets)} targets")
+        await asyncio.gather(*(_write(scan_writer.update_status(job.scan_id, "running")) for job in jobs))
         
-        # Generar nombre único para el archivo
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1]
-        file_path = os.path.join(upload_dir, f"{file_id}{file_extension}")
+        results = await scan_cache.run_cached_batch(SemgrepScanner(), targets, "sast")
         
-        # Guardar archivo
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        for job in jobs:
+            # Los escaneos cancelados durante el lote ya están marcados
+            if not job.cancelled:
+                await _store_scan_result(job.scan_id, job.scan_type, job.target, results[job.target])
         
-        return {
-            "file_id": file_id,
-            "filename": file.filename,
-            "file_path": file_path,
-            "size": len(content)
+    except asyncio.CancelledError:
+        logger.info(f"Batched sast scan of {len(jobs)} scans cancelled")
+        await asyncio.gather(*(_write(scan_writer.update_status(job.scan_id, "cancelled")) for job in jobs))
+        raise
+    except Exception as e:
+        logger.error(f"Error in batched sast scan: {str(e)}")
+        await asyncio.gather(*(
+            _write(scan_writer.update_status(job.scan_id, "failed")) for job in jobs if not job.cancelled
+        ))
+
+# Escritor único de estados y resultados de los escaneos en segundo plano
+scan_writer = ScanWriter()
+
+# Ejecutor con cola acotada y límites de concurrencia por herramienta
+# Los SAST pequeños se agrupan para pagar una sola vez el arranque de Semgrep
+scan_executor = ScanExecutor(run_security_scan, batch_runner=run_sast_batch, batch_key=sast_batch_key)
+
+@app.get("/")
+async def root():
+    return {"message": "DevSecOps Platform API", "version": "1.0.0"}
+
+# El cuerpo se lee en el propio endpoint (sin UploadFile): se documenta aquí
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["file"],
+                "properties": {"file": {"type": "string", "format": "binary"}}
+            }
         }
+    }
+}
+
+@app.post("/api/upload", response_model=dict, openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_file(request: Request):
+    """Subir archivo para escaneo (multipart/form-data, campo `file`)
+
+    El cuerpo se parsea por bloques a medida que llega y el archivo se
+    escribe directamente en su temporal por contenido: subir dos veces el
+    mismo contenido devuelve el mismo file_id sin volver a escribirlo. Si
+    Content-Length o los bytes recibidos superan el máximo se responde 413.
+    """
+    content_length = request.headers.get("content-length", "")
+    try:
+        return await save_upload(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            int(content_length) if content_length.isdigit() else None
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
 @app.post("/api/scan", response_model=ScanResponse)
-async def start_scan(scan_request: ScanRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def start_scan(scan_request: ScanRequest, db: AsyncSession = Depends(get_async_db)):
     """Iniciar un escaneo"""
     try:
         scan_id = str(uuid.uuid4())
         
         # Validar tipo de escaneo
-        valid_scan_types = ["sast", "sca", "docker", "secrets"]
+        valid_scan_types = ["sast", "sca", "docker", "secrets", "full"]
         if scan_request.scan_type not in valid_scan_types:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid scan type. Must be one of: {valid_scan_types}"
             )
         
+        # Validar las opciones del scanner
+        try:
+            ScannerFactory.create_scanner(scan_request.scan_type, scan_request.options)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid scan options: {str(e)}")
+        
+        # Rechazar si la cola está llena antes de crear el registro
+        if scan_executor.is_full():
+            raise HTTPException(status_code=503, detail="Scan queue is full, try again later")
+        
         # Crear registro de escaneo en la base de datos
-        ScanService.create_scan(db, scan_id, scan_request.scan_type, scan_request.target)
+        await AsyncScanService.create_scan(db, scan_id, scan_request.scan_type, scan_request.target)
         
-        # Ejecutar escaneo en segundo plano
-        background_tasks.add_task(
-            run_security_scan, 
-            scan_id, 
-            scan_request.scan_type, 
-            scan_request.target
-        )
+        # Encolar el escaneo en el ejecutor
+        try:
+            queue_position = scan_executor.submit(
+                scan_id,
+                scan_request.scan_type,
+                scan_request.target,
+                scan_request.options
+            )
+        except ScanQueueFullError as e:
+            await AsyncScanService.update_scan_status(db, scan_id, "failed")
+            raise HTTPException(status_code=503, detail=str(e))
         
         return ScanResponse(
             scan_id=scan_id,
             status="pending",
-            message=f"Scan {scan_request.scan_type} initiated for {scan_request.target}"
+            message=f"Scan {scan_request.scan_type} queued for {scan_request.target}",
+            queue_position=queue_position
         )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting scan: {str(e)}")
 
+@app.post("/api/sbom/rematch")
+async def rematch_sboms(db: AsyncSession = Depends(get_async_db)):
+    """Re-evaluar los SBOM guardados contra la base de datos de vulnerabilidades actual
+
+    Encola un escaneo SCA por SBOM que sólo cruza el SBOM con la base de
+    datos (sin leer el objetivo). Si la cola se llena, los SBOM restantes
+    se indican en `remaining` para reintentar más tarde.
+    """
+    stored = await asyncio.to_thread(sboms.list_sboms)
+    queued = []
+    for meta in stored:
+        if scan_executor.is_full():
+            break
+        scan_id = str(uuid.uuid4())
+        target = meta.get("target") or meta["digest"]
+        await AsyncScanService.create_scan(db, scan_id, "sca", target)
+        try:
+            scan_executor.submit(scan_id, "sca", target, {"sbom_digest": meta["digest"]})
+        except ScanQueueFullError:
+            await AsyncScanService.update_scan_status(db, scan_id, "failed")
+            break
+        queued.append(scan_id)
+    
+    return {
+        "queued": queued,
+        "remaining": len(stored) - len(queued)
+    }
+
 @app.get("/api/scan/{scan_id}", response_model=ScanResult)
-async def get_scan_result(scan_id: str, db: Session = Depends(get_db)):
-    """Obtener resultado de un escaneo"""
-    scan = ScanService.get_scan(db, scan_id)
+async def get_scan_result(scan_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Obtener el estado y el resumen de un escaneo (sin hallazgos)"""
+    scan = await AsyncScanService.get_scan(db, scan_id)
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    # Convertir findings de SQLAlchemy a dict
-    findings = [
-        {
-            "id": finding.id,
-            "scan_id": finding.scan_id,
-            "tool": finding.tool,
-            "severity": finding.severity,
-            "category": finding.category,
-            "description": finding.description,
-            "location": finding.location,
-            "solution": finding.solution,
-            "cve_id": finding.cve_id
-        }
-        for finding in scan.findings
-    ]
-    
     return ScanResult(
         scan_id=scan.scan_id,
         scan_type=scan.scan_type,
         timestamp=scan.timestamp,
         target=scan.target,
         status=scan.status,
-        findings=findings,
-        summary=scan.get_summary_dict()
+        summary=scan.get_summary_dict(),
+        queue_position=scan_executor.queue_position(scan_id) if scan.status == "pending" else None
+    )
+
+@app.get("/api/scan/{scan_id}/findings")
+async def get_scan_findings(
+    scan_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    severity: Optional[List[str]] = Query(None),
+    tool: Optional[str] = None,
+    category: Optional[str] = None,
+    sort: str = "id",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Listar los hallazgos de un escaneo, filtrados y paginados por cursor
+
+    La respuesta es una lista JSON serializada por bloques (sin modelos
+    Pydantic intermedios); si hay más resultados, la cabecera X-Next-Cursor
+    trae el cursor de la página siguiente.
+    """
+    if await AsyncScanService.get_scan(db, scan_id) is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    try:
+        findings, next_cursor = await AsyncFindingService.get_findings_page(
+            db, scan_id, limit, cursor, severity, tool, category, sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return StreamingResponse(_iter_json_list(findings), media_type="application/json", headers=headers)
+
+def _iter_json_list(items: List[Dict[str, Any]], chunk_size: int = 200) -> Iterator[bytes]:
+    """Serializar una lista JSON por bloques de elementos"""
+    yield b"["
+    for start in range(0, len(items), chunk_size):
+        chunk = ",".join(json.dumps(item) for item in items[start:start + chunk_size])
+        yield (chunk if start == 0 else "," + chunk).encode()
+    yield b"]"
+
+@app.delete("/api/scan/{scan_id}", response_model=ScanResponse)
+async def cancel_scan(scan_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Cancelar un escaneo en cola o en ejecución"""
+    scan = await AsyncScanService.get_scan(db, scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    if scan.status not in ["pending", "running"]:
+        raise HTTPException(status_code=409, detail=f"Scan already {scan.status}")
+    
+    # El cambio de estado sólo se aplica si el escaneo no terminó entretanto
+    cancelled = await _write(scan_writer.update_status(scan_id, "cancelled", only_from=("pending", "running")))
+    if cancelled is None:
+        raise HTTPException(status_code=409, detail="Scan is no longer pending or running")
+    
+    # Retirar de la cola o detener el proceso de la herramienta
+    scan_executor.cancel(scan_id)
+    
+    return ScanResponse(
+        scan_id=scan_id,
+        status="cancelled",
+        message=f"Scan {scan.scan_type} cancelled for {scan.target}"
     )
 
 @app.get("/api/scans", response_model=List[dict])
-async def list_scans(db: Session = Depends(get_db)):
-    """Listar todos los escaneos"""
-    scans = ScanService.get_scans(db)
+async def list_scans(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    scan_type: Optional[str] = None,
+    target: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Listar escaneos, del más reciente al más antiguo
+
+    Si hay más resultados, la cabecera X-Next-Cursor trae el cursor de la
+    página siguiente (parámetro `cursor`). Cuesta dos consultas sea cual
+    sea el historial: la página y el conteo agrupado de sus hallazgos.
+    """
+    try:
+        scans, next_cursor = await AsyncScanService.get_scans(db, limit, cursor, status, scan_type, target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    findings_counts = await AsyncFindingService.count_by_scan(db, [scan.scan_id for scan in scans])
     return [
         {
             "scan_id": scan.scan_id,
@@ -216,15 +432,52 @@ async def list_scans(db: Session = Depends(get_db)):
             "target": scan.target,
             "status": scan.status,
             "timestamp": scan.timestamp,
-            "findings_count": len(scan.findings)
+            "findings_count": findings_counts.get(scan.scan_id, 0)
         }
         for scan in scans
     ]
 
+@app.get("/api/queue")
+async def get_queue_stats():
+    """Obtener el estado de la cola de escaneos"""
+    return scan_executor.stats()
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Obtener estadísticas de la caché de resultados"""
+    return scan_cache.stats()
+
+@app.get("/api/rulepacks")
+async def get_rule_packs():
+    """Listar los paquetes de reglas de Semgrep instalados y el activo"""
+    active = rulepacks.active_pack()
+    return {
+        "active": active.version if active else None,
+        "packs": [
+            {"version": pack.version, "sources": pack.sources, "created_at": pack.created_at}
+            for pack in rulepacks.list_packs()
+        ]
+    }
+
 @app.get("/api/dashboard/stats")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
+async def get_dashboard_stats(db: AsyncSession = Depends(get_async_db)):
     """Obtener estadísticas para el dashboard"""
-    return DashboardService.get_dashboard_stats(db)
+    return await AsyncDashboardService.get_dashboard_stats(db)
+
+@app.get("/api/dashboard/trends")
+async def get_dashboard_trends(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    bucket: str = "day",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Serie temporal de escaneos y hallazgos (por defecto, los últimos 30 días)"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    try:
+        return await AsyncDashboardService.get_trends(db, start, end, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/test-alert")
 async def test_alert():
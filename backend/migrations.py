@@ -0,0 +1,107 @@
+"""Migraciones versionadas del esquema de la base de datos
+
+Cada migración tiene un número de versión y se aplica una sola vez; las
+aplicadas se registran en la tabla schema_version. migrate() se ejecuta al
+arrancar (create_tables) y aplica en orden las que falten, de modo que los
+cambios de esquema llegan también a las bases de datos ya existentes.
+
+Las migraciones deben ser idempotentes (CREATE ... IF NOT EXISTS, comprobar
+columnas antes de añadirlas): una base de datos nueva ya recibe el esquema
+actual completo en la migración inicial, y dos procesos pueden arrancar a la
+vez sobre la misma base de datos.
+
+Uso:
+    python migrations.py            aplicar las migraciones pendientes
+    python migrations.py status
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+def _create_tables(conn: Connection):
+    """Tablas que falten según los modelos (scans, findings, rollups)"""
+    from database import Base
+    Base.metadata.create_all(bind=conn)
+
+# Índices de las consultas de services.py: (nombre, tabla, columnas)
+INDEXES = [
+    ("ix_findings_scan_id", "findings", "scan_id"),
+    ("ix_findings_severity", "findings", "severity"),
+    ("ix_findings_cve_id", "findings", "cve_id"),
+    ("ix_findings_scan_id_severity", "findings", "scan_id, severity"),
+    ("ix_scans_timestamp", "scans", "timestamp"),
+]
+
+def _create_indexes(conn: Connection):
+    for name, table, columns in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables", _create_tables),
+    Migration(2, "indexes for per-scan, severity, CVE and timeline queries", _create_indexes),
+]
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        ))
+
+def current_version(engine: Engine) -> int:
+    """Última versión aplicada (0 si la base de datos no tiene migraciones)"""
+    if not inspect(engine).has_table("schema_version"):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+def migrate(engine: Engine) -> List[int]:
+    """Aplicar las migraciones pendientes en orden y devolver sus versiones"""
+    _ensure_version_table(engine)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current_version(engine):
+            continue
+        try:
+            with engine.begin() as conn:
+                migration.apply(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+                    {"version": migration.version, "description": migration.description, "applied_at": datetime.utcnow().isoformat()}
+                )
+        except IntegrityError:
+            # Otro proceso aplicó la misma migración a la vez
+            continue
+        logger.info(f"Applied database migration {migration.version}: {migration.description}")
+        applied.append(migration.version)
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["migrate", "status"], default="migrate")
+    args = parser.parse_args()
+
+    from database import engine
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "status":
+        version = current_version(engine)
+        for migration in MIGRATIONS:
+            marker = "x" if migration.version <= version else " "
+            print(f"[{marker}] {migration.version}  {migration.description}")
+    else:
+        migrate(engine)
+
+if __name__ == "__main__":
+    main()
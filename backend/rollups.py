@@ -0,0 +1,33 @@
+"""Mantenimiento de los rollups del dashboard
+
+Los contadores por día, tipo de escaneo, herramienta y severidad se
+actualizan solos al crear y completar escaneos; este comando los recalcula
+desde las tablas de escaneos y hallazgos (backfills, restauraciones o
+cambios manuales en la base de datos).
+
+Uso:
+    python rollups.py rebuild
+"""
+import argparse
+import json
+import logging
+
+from database import SessionLocal, create_tables
+from services import RollupService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild", help="recalcular todos los rollups")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    create_tables()
+    db = SessionLocal()
+    try:
+        print(json.dumps(RollupService.rebuild(db)))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Almacén local de paquetes de reglas de Semgrep
+
+Las reglas se resuelven una sola vez (descargándolas del registro de Semgrep
+o importándolas de un directorio local) y se guardan en disco bajo
+data/rulepacks/<versión>/, de modo que los escaneos no dependen de la red.
+Un paquete instalado no se modifica nunca; activar otra versión cambia las
+reglas de los escaneos siguientes (y, con ello, las claves de caché).
+
+Uso:
+    python rulepacks.py fetch [p/default ...]    descargar del registro y activar
+    python rulepacks.py import <ruta>            importar reglas locales y activar
+    python rulepacks.py list
+    python rulepacks.py activate <versión>
+    python rulepacks.py prune [--keep 3]
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import storage
+from storage import read_json, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Registro desde el que se resuelven las configuraciones (p/default, p/python, ...)
+REGISTRY_URL = os.getenv("SEMGREP_REGISTRY_URL", "https://semgrep.dev/c")
+
+RULE_EXTENSIONS = (".yml", ".yaml")
+
+class RulePackError(Exception):
+    """Error al instalar o activar un paquete de reglas"""
+
+class RulePack(NamedTuple):
+    """Paquete de reglas instalado"""
+    version: str
+    path: str
+    sources: List[str]
+    created_at: str
+
+def packs_dir() -> str:
+    return os.path.join(storage.DATA_DIR, "rulepacks")
+
+def _active_file() -> str:
+    return os.path.join(packs_dir(), "active.json")
+
+def _load_pack(version: str) -> Optional[RulePack]:
+    path = os.path.join(packs_dir(), version)
+    meta = read_json(os.path.join(path, "pack.json"))
+    if meta is None:
+        return None
+    return RulePack(version, os.path.join(path, "rules"), meta.get("sources", []), meta.get("created_at", ""))
+
+def list_packs() -> List[RulePack]:
+    """Paquetes instalados, del más reciente al más antiguo"""
+    if not os.path.isdir(packs_dir()):
+        return []
+    packs = [_load_pack(name) for name in os.listdir(packs_dir())]
+    return sorted((p for p in packs if p is not None), key=lambda p: p.created_at, reverse=True)
+
+# Paquete activo cacheado mientras no cambie active.json: ((mtime, inodo), paquete)
+_active_cache: Dict[str, tuple] = {}
+_active_lock = threading.Lock()
+
+def active_pack() -> Optional[RulePack]:
+    """Paquete de reglas activo (None si no hay ninguno instalado)"""
+    active_file = _active_file()
+    try:
+        stat = os.stat(active_file)
+    except OSError:
+        return None
+    # active.json se reemplaza con rename: el inodo cambia en cada activación
+    stamp = (stat.st_mtime_ns, stat.st_ino)
+    with _active_lock:
+        cached = _active_cache.get(active_file)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    state = read_json(active_file) or {}
+    pack = _load_pack(state["version"]) if state.get("version") else None
+    with _active_lock:
+        _active_cache[active_file] = (stamp, pack)
+    return pack
+
+def activate(version: str) -> RulePack:
+    """Activar una versión instalada"""
+    pack = _load_pack(version)
+    if pack is None:
+        raise RulePackError(f"Rule pack {version} is not installed")
+    write_json_atomic(_active_file(), {"version": version, "activated_at": datetime.utcnow().isoformat()})
+    logger.info(f"Activated Semgrep rule pack {version}")
+    return pack
+
+def _install(rule_files: Dict[str, bytes], sources: List[str], activate_pack: bool = True) -> RulePack:
+    """Guardar un conjunto de archivos de reglas como versión inmutable"""
+    if not rule_files:
+        raise RulePackError("No rule files found")
+    digest = hashlib.sha256()
+    for name in sorted(rule_files):
+        digest.update(name.encode() + b"\0" + hashlib.sha256(rule_files[name]).digest())
+    # La versión depende sólo del contenido: reinstalar las mismas reglas no invalida cachés
+    version = digest.hexdigest()[:16]
+
+    if _load_pack(version) is None:
+        os.makedirs(packs_dir(), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=packs_dir(), prefix=".staging-")
+        try:
+            rules_dir = os.path.join(staging, "rules")
+            for name, content in rule_files.items():
+                path = os.path.join(rules_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(content)
+            write_json_atomic(os.path.join(staging, "pack.json"), {
+                "sources": sources,
+                "created_at": datetime.utcnow().isoformat(),
+                "files": len(rule_files)
+            })
+            # Misma versión instalada a la vez por otro proceso: gana el primero
+            try:
+                os.rename(staging, os.path.join(packs_dir(), version))
+            except OSError:
+                if _load_pack(version) is None:
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Installed Semgrep rule pack {version} ({len(rule_files)} files from {', '.join(sources)})")
+
+    return activate(version) if activate_pack else _load_pack(version)
+
+def fetch_pack(configs: List[str], timeout: float = 60, activate_pack: bool = True) -> RulePack:
+    """Descargar configuraciones del registro de Semgrep e instalarlas como paquete"""
+    import requests
+
+    rule_files = {}
+    for config in configs:
+        url = f"{REGISTRY_URL.rstrip('/')}/{config}"
+        try:
+            response = requests.get(url, timeout=timeout, headers={"Accept": "application/x-yaml"})
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise RulePackError(f"Could not download rules {config}: {str(e)}")
+        rule_files[config.replace("/", "_") + ".yml"] = response.content
+    return _install(rule_files, list(configs), activate_pack)
+
+def import_pack(source: str, activate_pack: bool = True) -> RulePack:
+    """Importar reglas de un archivo o directorio local (runners sin red)"""
+    rule_files = {}
+    if os.path.isfile(source):
+        with open(source, "rb") as f:
+            rule_files[os.path.basename(source)] = f.read()
+    elif os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if name.endswith(RULE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        rule_files[os.path.relpath(path, source)] = f.read()
+    else:
+        raise RulePackError(f"Rule source not found: {source}")
+    return _install(rule_files, [os.path.abspath(source)], activate_pack)
+
+def prune(keep: int = 3) -> List[str]:
+    """Borrar versiones antiguas conservando las `keep` más recientes y la activa"""
+    active = active_pack()
+    removed = []
+    for pack in list_packs()[keep:]:
+        if active is not None and pack.version == active.version:
+            continue
+        shutil.rmtree(os.path.join(packs_dir(), pack.version), ignore_errors=True)
+        removed.append(pack.version)
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser("fetch", help="descargar reglas del registro")
+    fetch.add_argument("configs", nargs="*", default=["p/default"])
+    fetch.add_argument("--no-activate", action="store_true")
+    importer = commands.add_parser("import", help="importar reglas locales")
+    importer.add_argument("source")
+    importer.add_argument("--no-activate", action="store_true")
+    commands.add_parser("list", help="listar paquetes instalados")
+    activator = commands.add_parser("activate", help="activar una versión instalada")
+    activator.add_argument("version")
+    pruner = commands.add_parser("prune", help="borrar versiones antiguas")
+    pruner.add_argument("--keep", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == "fetch":
+            pack = fetch_pack(args.configs, activate_pack=not args.no_activate)
+            print(pack.version)
+        elif args.command == "import":
+            pack = import_pack(args.source, activate_pack=not args.no_activate)
+            print(pack.version)
+        elif args.command == "list":
+            active = active_pack()
+            for pack in list_packs():
+                marker = "*" if active is not None and pack.version == active.version else " "
+                print(f"{marker} {pack.version}  {pack.created_at}  {', '.join(pack.sources)}")
+        elif args.command == "activate":
+            activate(args.version)
+        elif args.command == "prune":
+            for version in prune(args.keep):
+                print(f"removed {version}")
+    except RulePackError as e:
+        parser.exit(1, f"error: {e}\n")
+
+if __name__ == "__main__":
+    main()
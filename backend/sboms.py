@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from storage import data_path, hash_file, read_json, tree_digest, write_json_atomic
+
+# Los SBOM (CycloneDX) se guardan por digest de contenido del objetivo:
+# data/sboms/<digest>.cdx.json y sus metadatos en <digest>.meta.json
+
+def target_digest(target: str) -> str:
+    """Digest del contenido de un archivo o directorio"""
+    if os.path.isfile(target):
+        return hash_file(target)
+    return tree_digest(target)
+
+def sbom_path(digest: str) -> str:
+    return data_path("sboms", f"{digest}.cdx.json")
+
+def _meta_path(digest: str) -> str:
+    return data_path("sboms", f"{digest}.meta.json")
+
+def has_sbom(digest: str) -> bool:
+    return os.path.exists(sbom_path(digest))
+
+def store_sbom(digest: str, generated_path: str, target: str):
+    """Mover un SBOM recién generado a su sitio definitivo y registrar su origen"""
+    os.replace(generated_path, sbom_path(digest))
+    write_json_atomic(_meta_path(digest), {
+        "digest": digest,
+        "target": target,
+        "created_at": datetime.utcnow().isoformat(),
+        "matched_at": None
+    })
+
+def mark_matched(digest: str):
+    """Registrar la última vez que el SBOM se cruzó con la base de vulnerabilidades"""
+    meta = read_json(_meta_path(digest)) or {"digest": digest}
+    meta["matched_at"] = datetime.utcnow().isoformat()
+    write_json_atomic(_meta_path(digest), meta)
+
+def get_sbom(digest: str) -> Optional[Dict[str, Any]]:
+    """Metadatos de un SBOM guardado (None si no existe)"""
+    if not has_sbom(digest):
+        return None
+    return read_json(_meta_path(digest)) or {"digest": digest}
+
+def list_sboms() -> List[Dict[str, Any]]:
+    """Metadatos de todos los SBOM guardados"""
+    directory = os.path.dirname(sbom_path("x"))
+    sboms = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".cdx.json"):
+            meta = get_sbom(name[:-len(".cdx.json")])
+            if meta is not None:
+                sboms.append(meta)
+    return sboms
@@ -1,88 +1,601 @@
-import subprocess
+import asyncio
+import codecs
+import hashlib
+import heapq
+import inspect
+import io
 import json
+import math
+import mmap
+import shutil
+import signal
 import tempfile
+import threading
 import os
-from typing import Dict, List, Any
+import re
+from typing import Callable, Dict, IO, Iterator, List, Any, NamedTuple, Optional, Tuple
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from json_stream import CHUNK_SIZE, JSONItemStream, JSONStreamError, iter_json_items
+import advisories
+import lockfiles
+import rulepacks
+import sboms
+from executor import load_tool_limits
+from storage import data_path, hash_tree_files, key_digest, read_json, write_json_atomic
 
 logger = logging.getLogger(__name__)
 
+# Tiempo de gracia entre SIGTERM y SIGKILL al detener una herramienta
+TERMINATE_GRACE_SECONDS = 5
+
+# Timeout máximo por invocación de Semgrep que puede pedir un escaneo
+SEMGREP_MAX_TIMEOUT = float(os.getenv("SEMGREP_MAX_TIMEOUT", "3600"))
+
+# Timeout máximo de los escaneos de secretos (Gitleaks y motor nativo)
+SECRETS_MAX_TIMEOUT = float(os.getenv("SECRETS_MAX_TIMEOUT", "3600"))
+
+# Timeout máximo del cribado de lockfiles contra el índice de avisos
+ADVISORIES_MAX_TIMEOUT = float(os.getenv("ADVISORIES_MAX_TIMEOUT", "600"))
+
+# Versiones detectadas por herramienta: nombre -> (huella de archivos, versión)
+_tool_versions: Dict[str, tuple] = {}
+
+class CommandResult(NamedTuple):
+    """Resultado de ejecutar una herramienta externa"""
+    returncode: int
+    stdout: str
+    stderr: str
+
+async def _terminate_process(process: asyncio.subprocess.Process):
+    """Detener el proceso y todo su grupo (SIGTERM y luego SIGKILL)"""
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        await asyncio.wait_for(process.wait(), TERMINATE_GRACE_SECONDS)
+    except ProcessLookupError:
+        return
+    except asyncio.TimeoutError:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return
+        await process.wait()
+
+async def _communicate(process: asyncio.subprocess.Process, on_stdout: Optional[Callable[[bytes], None]]):
+    """Esperar al proceso; si hay consumidor, stdout se le entrega por fragmentos"""
+    if on_stdout is None:
+        return await process.communicate()
+    
+    async def pump_stdout():
+        while True:
+            chunk = await process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            # El parseo es CPU: se hace fuera del event loop, fragmento a fragmento
+            await asyncio.to_thread(on_stdout, chunk)
+    
+    _, stderr = await asyncio.gather(pump_stdout(), process.stderr.read())
+    await process.wait()
+    return b"", stderr
+
+async def run_command(
+    cmd: List[str],
+    timeout: float,
+    on_stdout: Optional[Callable[[bytes], None]] = None
+) -> CommandResult:
+    """Ejecutar una herramienta como subproceso asyncio
+
+    El timeout lo vigila el propio event loop (sin un hilo por proceso).
+    Si se alcanza el timeout o la tarea se cancela, el proceso hijo y sus
+    descendientes se terminan antes de propagar la excepción. Con
+    `on_stdout` la salida no se acumula: se entrega por fragmentos al
+    consumidor y `stdout` del resultado queda vacío.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True  # Grupo propio para poder matar a los hijos
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(_communicate(process, on_stdout), timeout)
+    except BaseException:
+        await _terminate_process(process)
+        raise
+    return CommandResult(
+        process.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace")
+    )
+
+def jobs_per_scan(scan_type: str) -> int:
+    """Procesos que puede usar un escaneo sin sobrepasar las CPUs
+
+    Con SCAN_LIMIT_<TIPO> escaneos del mismo tipo en paralelo, cada uno
+    recibe su parte de las CPUs (al menos un proceso).
+    """
+    return max(1, (os.cpu_count() or 1) // load_tool_limits().get(scan_type, 1))
+
+class FindingStream:
+    """Convierte la salida JSON de una herramienta en hallazgos a medida que llega
+
+    No se retiene la salida en bruto, pero los hallazgos normalizados se
+    acumulan en `findings` hasta close(): la memoria crece con el número de
+    hallazgos del informe (no con su tamaño en bytes).
+    """
+    
+    def __init__(self, scanner: "SecurityScanner"):
+        self.scanner = scanner
+        self.findings = []
+        self.error = None
+        self._parser = JSONItemStream(scanner.STREAM_PATH)
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    
+    def feed(self, chunk: bytes):
+        """Procesar un fragmento de la salida"""
+        if self.error is None:
+            self._collect(lambda: self._parser.feed(self._decoder.decode(chunk)))
+    
+    def close(self) -> List[Dict[str, Any]]:
+        """Terminar el parseo y devolver los hallazgos normalizados"""
+        if self.error is None:
+            self._collect(lambda: self._parser.feed(self._decoder.decode(b"", final=True)) + self._parser.close())
+        if self.error is not None:
+            logger.error(f"Error parsing {self.scanner.name} JSON: {str(self.error)}")
+            return []
+        return self.findings
+    
+    def _collect(self, parse: Callable[[], list]):
+        try:
+            for context, item in parse():
+                if isinstance(item, dict):
+                    self._add(context, item)
+        except JSONStreamError as e:
+            self.error = e
+    
+    def _add(self, context: Dict[str, Any], item: Dict[str, Any]):
+        self.findings.append(self.scanner._normalize(context, item))
+
+class LayerFindingStream(FindingStream):
+    """FindingStream que además cuenta los hallazgos por capa de la imagen (DiffID)"""
+    
+    def __init__(self, scanner: "SecurityScanner"):
+        super().__init__(scanner)
+        self.by_layer: Dict[Optional[str], int] = {}
+    
+    def _add(self, context: Dict[str, Any], item: Dict[str, Any]):
+        super()._add(context, item)
+        diff_id = (item.get("Layer") or {}).get("DiffID")
+        self.by_layer[diff_id] = self.by_layer.get(diff_id, 0) + 1
+
 class SecurityScanner:
     """Clase base para todos los escáneres de seguridad"""
     
+    # Ruta en el JSON de la herramienta hasta cada hallazgo (ver JSONItemStream)
+    STREAM_PATH = ("*",)
+    
+    # Comando que imprime la versión de la herramienta
+    VERSION_COMMAND: List[str] = []
+    
     def __init__(self):
         self.name = "BaseScanner"
+        # Digest de contenido conocido de antemano (evita calcularlo sobre el objetivo)
+        self.pinned_digest: Optional[str] = None
+        # Si se guarda estado local indexado por la ruta del objetivo (manifiestos incrementales)
+        self.path_state = True
+    
+    @property
+    def rule_config(self) -> str:
+        """Configuración de reglas que influye en los resultados"""
+        return "default"
+    
+    def disable_path_state(self):
+        """No usar estado local por ruta: el objetivo es temporal (p. ej. un archivo extraído)
+
+        La ruta de un espacio de trabajo no se repite, así que un manifiesto
+        indexado por ella nunca se reutilizaría y quedaría huérfano.
+        """
+        self.path_state = False
+    
+    async def pin_digest(self, scan_type: str, target: str) -> Optional[str]:
+        """Digest de contenido que el scanner puede fijar sin recorrer el objetivo
+
+        None si no lo conoce: la caché lo calcula entonces sobre el objetivo.
+        """
+        return self.pinned_digest
+    
+    async def tool_version(self) -> Optional[str]:
+        """Obtener la versión de la herramienta
+
+        Se cachea mientras no cambien los archivos de _version_files(), de modo
+        que actualizar el binario (o su base de datos) produce una versión nueva.
+        """
+        fingerprint = []
+        for path in self._version_files():
+            if os.path.exists(path):
+                stat = os.stat(path)
+                fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        if not fingerprint:
+            return None
+        fingerprint = tuple(fingerprint)
+        
+        cached = _tool_versions.get(self.name)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        
+        try:
+            result = await run_command(self.VERSION_COMMAND, timeout=60)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Could not determine {self.name} version: {str(e)}")
+            return None
+        if result.returncode != 0:
+            logger.warning(f"Could not determine {self.name} version: {result.stderr}")
+            return None
+        version = " ".join(result.stdout.split())
+        _tool_versions[self.name] = (fingerprint, version)
+        return version
+    
+    def _version_files(self) -> List[str]:
+        """Archivos cuya modificación implica una versión distinta de la herramienta"""
+        binary = shutil.which(self.VERSION_COMMAND[0]) if self.VERSION_COMMAND else None
+        return [os.path.realpath(binary)] if binary else []
     
     def scan(self, target: str, scan_type: str) -> Dict[str, Any]:
+        """Realizar el escaneo de forma síncrona (envoltorio de scan_async)"""
+        return asyncio.run(self.scan_async(target, scan_type))
+    
+    async def scan_async(self, target: str, scan_type: str) -> Dict[str, Any]:
         """Método base para realizar escaneos"""
-        raise NotImplementedError("Subclasses must implement scan method")
+        raise NotImplementedError("Subclasses must implement scan_async method")
     
     def parse_results(self, raw_output: str) -> List[Dict[str, Any]]:
-        """Método base para parsear resultados"""
-        raise NotImplementedError("Subclasses must implement parse_results method")
+        """Parsear la salida JSON completa de la herramienta (ver iter_findings)"""
+        try:
+            return list(self.iter_findings(io.StringIO(raw_output)))
+        except JSONStreamError as e:
+            logger.error(f"Error parsing {self.name} JSON: {str(e)}")
+            return []
+    
+    def iter_findings(self, stream: IO) -> Iterator[Dict[str, Any]]:
+        """Producir hallazgos normalizados uno a uno leyendo la salida por fragmentos"""
+        for context, item in iter_json_items(stream, self.STREAM_PATH):
+            if isinstance(item, dict):
+                yield self._normalize(context, item)
+    
+    def _normalize(self, context: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertir un resultado de la herramienta al formato de hallazgo común"""
+        raise NotImplementedError("Subclasses must implement _normalize method")
+    
+    def _build_result(self, findings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Construir el resultado de un escaneo completado"""
+        return {
+            "status": "completed",
+            "tool": self.name,
+            "findings": findings,
+            "summary": {
+                "total_findings": len(findings),
+                "critical": len([f for f in findings if f.get("severity") == "critical"]),
+                "high": len([f for f in findings if f.get("severity") == "high"]),
+                "medium": len([f for f in findings if f.get("severity") == "medium"]),
+                "low": len([f for f in findings if f.get("severity") == "low"])
+            }
+        }
+    
+    def _error_result(self, message: str) -> Dict[str, Any]:
+        """Construir el resultado de un escaneo fallido"""
+        return {
+            "status": "error",
+            "message": message,
+            "findings": []
+        }
+
+class SemgrepError(Exception):
+    """Semgrep terminó con un código de error"""
 
 class SemgrepScanner(SecurityScanner):
-    """Scanner para análisis de código fuente (SAST) usando Semgrep"""
+    """Scanner para análisis de código fuente (SAST) usando Semgrep
+
+    Con `incremental=True` y un directorio como objetivo se mantiene un
+    manifiesto por objetivo con el hash y los hallazgos de cada archivo;
+    los escaneos siguientes sólo ejecutan Semgrep sobre los archivos
+    añadidos o modificados y reutilizan los hallazgos del resto.
     
-    def __init__(self):
+    Con `sharded=True` la lista de archivos se reparte en shards de tamaño
+    equilibrado que se escanean en paralelo (`jobs` procesos Semgrep a la
+    vez). Si un shard falla o agota su timeout, el resultado se devuelve
+    parcial y marcado con `incomplete` en lugar de fallar el escaneo.
+
+    Las reglas salen del paquete local activo (ver rulepacks.py), fijado al
+    crear el scanner; sólo si no hay ninguno instalado se usa `--config=auto`,
+    que las descarga en cada ejecución.
+    """
+    
+    STREAM_PATH = ("results", "*")
+    VERSION_COMMAND = ["semgrep", "--version"]
+    
+    # Máximo de archivos por invocación cuando se pasan rutas explícitas
+    MAX_PATHS_PER_RUN = 200
+    
+    # Máximo de archivos por shard (limita la longitud de la línea de comandos)
+    MAX_FILES_PER_SHARD = 2000
+    
+    # Directorios que se omiten al listar archivos explícitamente
+    EXCLUDE_DIRS = {".git", "node_modules", ".venv", "venv", ".tox", "__pycache__"}
+    
+    def __init__(
+        self,
+        incremental: bool = False,
+        sharded: bool = False,
+        jobs: Optional[int] = None,
+        timeout: float = 300
+    ):
         super().__init__()
         self.name = "Semgrep"
+        if jobs is not None and (not isinstance(jobs, int) or jobs < 1):
+            raise ValueError("jobs must be a positive integer")
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ValueError("timeout must be a positive number")
+        self.incremental = incremental
+        self.sharded = sharded
+        # Acotados: los escaneos SAST simultáneos se reparten las CPUs
+        self.jobs = jobs_per_scan("sast") if jobs is None else min(jobs, jobs_per_scan("sast"))
+        self.timeout = min(timeout, SEMGREP_MAX_TIMEOUT)  # Por invocación de Semgrep (por shard en modo sharded)
+        self.rule_pack = rulepacks.active_pack()
+    
+    @property
+    def rule_config(self) -> str:
+        """Configuración de reglas: versión del paquete local o "auto" """
+        if self.rule_pack is not None:
+            return f"pack:{self.rule_pack.version}"
+        return "auto"
+    
+    def _config_args(self) -> List[str]:
+        """Argumentos de configuración de reglas para Semgrep"""
+        if self.rule_pack is None:
+            return ["--config=auto"]
+        # Reglas locales: sin métricas ni comprobación de versión no se toca la red
+        return [f"--config={self.rule_pack.path}", "--metrics=off", "--disable-version-check"]
     
-    def scan(self, target: str, scan_type: str = "sast") -> Dict[str, Any]:
+    def _build_result(self, findings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Construir el resultado registrando el paquete de reglas usado"""
+        result = super()._build_result(findings)
+        result["summary"]["rule_pack"] = self.rule_pack.version if self.rule_pack is not None else None
+        return result
+    
+    async def scan_async(self, target: str, scan_type: str = "sast") -> Dict[str, Any]:
         """Ejecutar escaneo SAST con Semgrep"""
         try:
-            # Comando Semgrep con reglas automáticas
-            cmd = [
-                "semgrep",
-                "--config=auto",
-                "--json",
-                "--quiet",
-                target
-            ]
+            if self.incremental and self.path_state and os.path.isdir(target):
+                return await self._scan_incremental(target)
+            if self.sharded and os.path.isdir(target):
+                return await self._scan_sharded(target)
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutos timeout
-            )
+            findings = await self._run_semgrep([target])
             
-            if result.returncode != 0 and result.returncode != 1:  # Semgrep retorna 1 si encuentra issues
-                logger.error(f"Semgrep error: {result.stderr}")
-                return {
-                    "status": "error",
-                    "message": f"Semgrep scan failed: {result.stderr}",
-                    "findings": []
-                }
+            return self._build_result(findings)
             
-            findings = self.parse_results(result.stdout)
-            
-            return {
-                "status": "completed",
-                "tool": self.name,
-                "findings": findings,
-                "summary": {
-                    "total_findings": len(findings),
-                    "critical": len([f for f in findings if f.get("severity") == "critical"]),
-                    "high": len([f for f in findings if f.get("severity") == "high"]),
-                    "medium": len([f for f in findings if f.get("severity") == "medium"]),
-                    "low": len([f for f in findings if f.get("severity") == "low"])
-                }
-            }
-            
-        except subprocess.TimeoutExpired:
-            return {
-                "status": "error",
-                "message": "Semgrep scan timed out",
-                "findings": []
-            }
+        except SemgrepError as e:
+            return self._error_result(str(e))
+        except asyncio.TimeoutError:
+            return self._error_result("Semgrep scan timed out")
         except Exception as e:
             logger.error(f"Semgrep scan error: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"Semgrep scan failed: {str(e)}",
-                "findings": []
-            }
+            return self._error_result(f"Semgrep scan failed: {str(e)}")
+
+    async def scan_batch_async(self, targets: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Escanear varios objetivos con una sola invocación de Semgrep
+
+        El arranque y la carga de reglas se pagan una vez por lote; los
+        hallazgos se reparten después a cada objetivo por prefijo de ruta.
+        Si la invocación conjunta falla, cada objetivo se escanea por separado
+        (uno tras otro) para que un objetivo problemático no arrastre al resto.
+        """
+        targets = list(dict.fromkeys(targets))
+        results = {
+            target: self._error_result(f"Target not found: {target}")
+            for target in targets if not os.path.exists(target)
+        }
+        existing = [target for target in targets if target not in results]
+        if not existing:
+            return results
+
+        try:
+            findings = await self._run_semgrep(existing)
+        except (SemgrepError, asyncio.TimeoutError) as e:
+            logger.warning(f"Batched Semgrep run over {len(existing)} targets failed, scanning them separately: {str(e)}")
+            # De uno en uno: el lote ocupa un solo hueco del límite de escaneos SAST
+            for target in existing:
+                results[target] = await self.scan_async(target)
+            return results
+
+        by_target: Dict[str, List[Dict[str, Any]]] = {target: [] for target in existing}
+        prefixes = [(target, os.path.abspath(target)) for target in existing]
+        for finding in findings:
+            path = os.path.abspath(finding["location"].rsplit(":", 1)[0])
+            # Un archivo pertenece a todos los objetivos que lo contienen
+            for target, prefix in prefixes:
+                if path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep):
+                    by_target[target].append(finding)
+
+        for target in existing:
+            results[target] = self._build_result(by_target[target])
+            results[target]["summary"]["batch_size"] = len(existing)
+        return results
+
+    async def _run_semgrep(
+        self,
+        paths: List[str],
+        extra_args: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Ejecutar Semgrep sobre una o varias rutas y devolver los hallazgos"""
+        # Comando Semgrep con la configuración de reglas activa
+        cmd = [
+            "semgrep",
+            *self._config_args(),
+            "--json",
+            "--quiet",
+            *(extra_args or []),
+            *paths
+        ]
+        
+        findings = FindingStream(self)
+        result = await run_command(cmd, timeout=self.timeout, on_stdout=findings.feed)
+        
+        if result.returncode != 0 and result.returncode != 1:  # Semgrep retorna 1 si encuentra issues
+            logger.error(f"Semgrep error: {result.stderr}")
+            raise SemgrepError(f"Semgrep scan failed: {result.stderr}")
+        
+        return findings.close()
+    
+    async def _scan_sharded(self, target: str) -> Dict[str, Any]:
+        """Escanear un directorio repartiendo sus archivos en shards paralelos"""
+        paths = await asyncio.to_thread(self._list_files, target)
+        findings, failed = await self._run_sharded(paths)
+        if paths and len(failed) == len(paths):
+            raise SemgrepError("Semgrep scan failed: all shards failed or timed out")
+        
+        result = self._build_result(findings)
+        self._mark_failed_files(result, failed)
+        return result
+    
+    def _list_files(self, target: str) -> List[str]:
+        """Listar los archivos regulares de un directorio"""
+        paths = []
+        for root, dirs, files in os.walk(target):
+            dirs[:] = sorted(d for d in dirs if d not in self.EXCLUDE_DIRS)
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    paths.append(path)
+        return paths
+    
+    def _make_shards(self, paths: List[str]) -> List[List[str]]:
+        """Repartir archivos en shards de tamaño total equilibrado (mayor primero)"""
+        if not paths:
+            return []
+        shard_count = max(self.jobs, -(-len(paths) // self.MAX_FILES_PER_SHARD))
+        shard_count = min(shard_count, len(paths))
+        sized = sorted(((os.path.getsize(p) if os.path.exists(p) else 0, p) for p in paths), reverse=True)
+        
+        shards: List[List[str]] = [[] for _ in range(shard_count)]
+        heap = [(0, index) for index in range(shard_count)]
+        for size, path in sized:
+            total, index = heapq.heappop(heap)
+            shards[index].append(path)
+            heapq.heappush(heap, (total + size, index))
+        return shards
+    
+    async def _run_sharded(self, paths: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Ejecutar los shards en paralelo; devuelve hallazgos deduplicados y archivos no escaneados"""
+        semaphore = asyncio.Semaphore(self.jobs)
+        
+        async def run_shard(shard: List[str]):
+            async with semaphore:
+                try:
+                    # Un proceso por shard: Semgrep no debe paralelizar internamente
+                    return await self._run_semgrep(shard, extra_args=["--jobs=1"]), []
+                except asyncio.TimeoutError:
+                    logger.warning(f"Semgrep shard of {len(shard)} files timed out")
+                except SemgrepError as e:
+                    logger.warning(f"Semgrep shard of {len(shard)} files failed: {str(e)}")
+                return [], shard
+        
+        results = await asyncio.gather(*(run_shard(shard) for shard in self._make_shards(paths)))
+        
+        findings = []
+        failed = []
+        seen = set()
+        for shard_findings, shard_failed in results:
+            failed.extend(shard_failed)
+            for finding in shard_findings:
+                key = (finding["category"], finding["location"], finding["description"])
+                if key not in seen:
+                    seen.add(key)
+                    findings.append(finding)
+        return findings, failed
+    
+    async def _scan_paths(self, paths: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Escanear archivos explícitos, en shards o en lotes secuenciales"""
+        if self.sharded:
+            return await self._run_sharded(paths)
+        findings = []
+        for start in range(0, len(paths), self.MAX_PATHS_PER_RUN):
+            findings.extend(await self._run_semgrep(paths[start:start + self.MAX_PATHS_PER_RUN]))
+        return findings, []
+    
+    def _mark_failed_files(self, result: Dict[str, Any], failed: List[str]):
+        """Marcar un resultado como incompleto si quedaron archivos sin escanear"""
+        if failed:
+            result["summary"]["incomplete"] = True
+            result["summary"]["unscanned_files"] = len(failed)
+    
+    async def _scan_incremental(self, target: str) -> Dict[str, Any]:
+        """Escanear sólo los archivos añadidos o modificados desde el último escaneo"""
+        files = await asyncio.to_thread(hash_tree_files, target, self.EXCLUDE_DIRS)
+        manifest_path = data_path("semgrep", f"{key_digest(os.path.abspath(target))}.json")
+        manifest = await asyncio.to_thread(read_json, manifest_path) or {}
+        
+        # El manifiesto sólo vale con la misma versión de Semgrep y las mismas reglas
+        version = await self.tool_version()
+        reusable = (
+            version is not None
+            and manifest.get("tool_version") == version
+            and manifest.get("rule_config") == self.rule_config
+        )
+        previous = manifest.get("files", {}) if reusable else {}
+        
+        changed = [rel for rel, file_hash in files.items() if previous.get(rel, {}).get("hash") != file_hash]
+        deleted = [rel for rel in previous if rel not in files]
+        
+        failed = []
+        if not previous and not self.sharded:
+            # Primer escaneo: árbol completo (Semgrep aplica sus exclusiones)
+            new_findings = await self._run_semgrep([target])
+        else:
+            new_findings, failed = await self._scan_paths([os.path.join(target, rel) for rel in changed])
+        
+        by_file = self._group_by_file(new_findings, target)
+        changed_set = set(changed)
+        failed_set = {os.path.relpath(path, target) for path in failed}
+        entries = {}
+        findings = []
+        for rel, file_hash in files.items():
+            if rel in failed_set:
+                # Sin escanear: se conserva la entrada anterior para reintentarlo la próxima vez
+                if rel in previous:
+                    entries[rel] = previous[rel]
+                    findings.extend(previous[rel]["findings"])
+                continue
+            file_findings = by_file.get(rel, []) if rel in changed_set else previous[rel]["findings"]
+            entries[rel] = {"hash": file_hash, "findings": file_findings}
+            findings.extend(file_findings)
+        
+        await asyncio.to_thread(write_json_atomic, manifest_path, {
+            "target": os.path.abspath(target),
+            "tool_version": version,
+            "rule_config": self.rule_config,
+            "files": entries
+        })
+        
+        result = self._build_result(findings)
+        result["summary"]["incremental"] = {
+            "scanned_files": len(changed) - len(failed),
+            "unchanged_files": len(files) - len(changed),
+            "deleted_files": len(deleted)
+        }
+        self._mark_failed_files(result, failed)
+        return result
+    
+    def _group_by_file(self, findings: List[Dict[str, Any]], target: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Agrupar hallazgos por archivo relativo al objetivo"""
+        by_file: Dict[str, List[Dict[str, Any]]] = {}
+        for finding in findings:
+            path = finding["location"].rsplit(":", 1)[0]
+            by_file.setdefault(os.path.relpath(path, target), []).append(finding)
+        return by_file
     
     def parse_results(self, raw_output: str) -> List[Dict[str, Any]]:
         """Parsear resultados JSON de Semgrep"""
@@ -94,16 +607,7 @@ class SemgrepScanner(SecurityScanner):
             findings = []
             
             for result in data.get("results", []):
-                finding = {
-                    "tool": self.name,
-                    "severity": self._map_severity(result.get("extra", {}).get("severity", "info")),
-                    "category": result.get("check_id", "Unknown"),
-                    "description": result.get("extra", {}).get("message", "No description"),
-                    "location": f"{result.get('path', 'Unknown')}:{result.get('start', {}).get('line', 0)}",
-                    "solution": result.get("extra", {}).get("fix", "No solution provided"),
-                    "cve_id": None
-                }
-                findings.append(finding)
+                findings.append(self._normalize({}, result))
             
             return findings
             
@@ -114,6 +618,18 @@ class SemgrepScanner(SecurityScanner):
             logger.error(f"Error processing Semgrep results: {str(e)}")
             return []
     
+    def _normalize(self, context: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertir un resultado de Semgrep en hallazgo"""
+        return {
+            "tool": self.name,
+            "severity": self._map_severity(result.get("extra", {}).get("severity", "info")),
+            "category": result.get("check_id", "Unknown"),
+            "description": result.get("extra", {}).get("message", "No description"),
+            "location": f"{result.get('path', 'Unknown')}:{result.get('start', {}).get('line', 0)}",
+            "solution": result.get("extra", {}).get("fix", "No solution provided"),
+            "cve_id": None
+        }
+    
     def _map_severity(self, semgrep_severity: str) -> str:
         """Mapear severidades de Semgrep a nuestro estándar"""
         mapping = {
@@ -124,35 +640,75 @@ class SemgrepScanner(SecurityScanner):
         return mapping.get(semgrep_severity.upper(), "info")
 
 class TrivyScanner(SecurityScanner):
-    """Scanner para dependencias (SCA) e imágenes Docker usando Trivy"""
+    """Scanner para dependencias (SCA) e imágenes Docker usando Trivy
+
+    En imágenes, Trivy analiza cada capa una sola vez y guarda el resultado
+    en su caché por DiffID (TRIVY_CACHE_DIR, que debe ser persistente y
+    compartida); las imágenes con la misma base sólo analizan sus capas
+    propias. El scanner lleva un índice de las capas ya vistas (por DiffID y
+    versión de Trivy, como la caché de Trivy) para informar en `summary.layers` de qué capas se
+    reutilizaron y cuántos hallazgos aporta cada una.
+
+    Los hallazgos no se cachean por capa: Trivy atribuye cada paquete a la
+    capa superior que lo instaló, así que lo que aporta una capa depende
+    también de las capas que tiene encima.
+
+    Con `sbom=True`, un escaneo SCA genera una sola vez el SBOM (CycloneDX)
+    de cada contenido de objetivo y lo guarda (ver sboms.py); los escaneos
+    siguientes del mismo contenido sólo cruzan ese SBOM con la base de datos
+    de vulnerabilidades actual, sin recorrer el objetivo buscando paquetes.
+    Con `sbom_digest` se re-evalúa directamente un SBOM guardado.
+    """
     
-    def __init__(self):
+    STREAM_PATH = ("Results", "*", "Vulnerabilities", "*")
+    VERSION_COMMAND = ["trivy", "--version"]
+    
+    def __init__(self, sbom: bool = False, sbom_digest: Optional[str] = None):
         super().__init__()
         self.name = "Trivy"
+        if sbom_digest is not None and not re.fullmatch(r"[0-9a-f]{64}", sbom_digest):
+            raise ValueError("sbom_digest must be a SHA-256 hex digest")
+        self.sbom = sbom
+        self.sbom_digest = sbom_digest
+        # Un SBOM guardado identifica el contenido sin volver a leer el objetivo
+        self.pinned_digest = f"sbom:{sbom_digest}" if sbom_digest else None
     
-    def scan(self, target: str, scan_type: str) -> Dict[str, Any]:
+    async def pin_digest(self, scan_type: str, target: str) -> Optional[str]:
+        """En modo SBOM el digest del contenido se calcula una sola vez por escaneo
+
+        Lo comparten la clave de caché y el nombre del SBOM guardado.
+        """
+        if self.pinned_digest is None and self.sbom and scan_type == "sca" and os.path.exists(target):
+            digest = await asyncio.to_thread(sboms.target_digest, target)
+            self.pinned_digest = ("file:" if os.path.isfile(target) else "tree:") + digest
+        return self.pinned_digest
+    
+    def _version_files(self) -> List[str]:
+        """El binario y la base de datos de vulnerabilidades (su versión aparece en --version)"""
+        cache_dir = os.getenv("TRIVY_CACHE_DIR", os.path.expanduser("~/.cache/trivy"))
+        return super()._version_files() + [os.path.join(cache_dir, "db", "metadata.json")]
+    
+    async def scan_async(self, target: str, scan_type: str) -> Dict[str, Any]:
         """Ejecutar escaneo con Trivy"""
         try:
             if scan_type == "sca":
-                return self._scan_dependencies(target)
+                if self.sbom_digest:
+                    return await self._match_sbom(self.sbom_digest)
+                if self.sbom:
+                    return await self._scan_dependencies_sbom(target)
+                return await self._scan_dependencies(target)
             elif scan_type == "docker":
-                return self._scan_docker_image(target)
+                return await self._scan_docker_image(target)
             else:
-                return {
-                    "status": "error",
-                    "message": f"Unsupported scan type for Trivy: {scan_type}",
-                    "findings": []
-                }
+                return self._error_result(f"Unsupported scan type for Trivy: {scan_type}")
                 
+        except asyncio.TimeoutError:
+            return self._error_result("Trivy scan timed out")
         except Exception as e:
             logger.error(f"Trivy scan error: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"Trivy scan failed: {str(e)}",
-                "findings": []
-            }
+            return self._error_result(f"Trivy scan failed: {str(e)}")
     
-    def _scan_dependencies(self, target: str) -> Dict[str, Any]:
+    async def _scan_dependencies(self, target: str) -> Dict[str, Any]:
         """Escanear dependencias en un directorio"""
         cmd = [
             "trivy",
@@ -162,36 +718,72 @@ class TrivyScanner(SecurityScanner):
             target
         ]
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
+        findings = FindingStream(self)
+        result = await run_command(cmd, timeout=300, on_stdout=findings.feed)
         
         if result.returncode != 0:
-            return {
-                "status": "error",
-                "message": f"Trivy dependency scan failed: {result.stderr}",
-                "findings": []
-            }
+            return self._error_result(f"Trivy dependency scan failed: {result.stderr}")
         
-        findings = self.parse_results(result.stdout)
+        return self._build_result(findings.close())
+    
+    async def _scan_dependencies_sbom(self, target: str) -> Dict[str, Any]:
+        """Escanear dependencias generando el SBOM sólo si el contenido es nuevo"""
+        if not os.path.exists(target):
+            return self._error_result(f"Target not found: {target}")
         
-        return {
-            "status": "completed",
-            "tool": self.name,
-            "findings": findings,
-            "summary": {
-                "total_findings": len(findings),
-                "critical": len([f for f in findings if f.get("severity") == "critical"]),
-                "high": len([f for f in findings if f.get("severity") == "high"]),
-                "medium": len([f for f in findings if f.get("severity") == "medium"]),
-                "low": len([f for f in findings if f.get("severity") == "low"])
-            }
-        }
+        # El digest ya calculado para la clave de caché identifica el SBOM
+        digest = (await self.pin_digest("sca", target)).split(":", 1)[1]
+        reused = await asyncio.to_thread(sboms.has_sbom, digest)
+        if not reused:
+            # Temporal propio: dos escaneos del mismo contenido no comparten archivo
+            fd, generated = tempfile.mkstemp(dir=os.path.dirname(sboms.sbom_path(digest)), suffix=".tmp")
+            os.close(fd)
+            cmd = [
+                "trivy",
+                "fs",
+                "--format", "cyclonedx",
+                "--output", generated,
+                "--quiet",
+                target
+            ]
+            try:
+                result = await run_command(cmd, timeout=300)
+                if result.returncode != 0:
+                    return self._error_result(f"Trivy SBOM generation failed: {result.stderr}")
+                await asyncio.to_thread(sboms.store_sbom, digest, generated, target)
+            finally:
+                if os.path.exists(generated):
+                    os.unlink(generated)
+        
+        scan_result = await self._match_sbom(digest)
+        if scan_result["status"] == "completed":
+            scan_result["summary"]["sbom"]["reused"] = reused
+        return scan_result
     
-    def _scan_docker_image(self, image_name: str) -> Dict[str, Any]:
+    async def _match_sbom(self, digest: str) -> Dict[str, Any]:
+        """Cruzar un SBOM guardado con la base de datos de vulnerabilidades actual"""
+        if not sboms.has_sbom(digest):
+            return self._error_result(f"SBOM not found: {digest}")
+        cmd = [
+            "trivy",
+            "sbom",
+            "--format", "json",
+            "--quiet",
+            sboms.sbom_path(digest)
+        ]
+        
+        findings = FindingStream(self)
+        result = await run_command(cmd, timeout=300, on_stdout=findings.feed)
+        
+        if result.returncode != 0:
+            return self._error_result(f"Trivy SBOM scan failed: {result.stderr}")
+        
+        await asyncio.to_thread(sboms.mark_matched, digest)
+        scan_result = self._build_result(findings.close())
+        scan_result["summary"]["sbom"] = {"digest": digest, "reused": True}
+        return scan_result
+    
+    async def _scan_docker_image(self, image_name: str) -> Dict[str, Any]:
         """Escanear imagen Docker"""
         cmd = [
             "trivy",
@@ -201,34 +793,64 @@ class TrivyScanner(SecurityScanner):
             image_name
         ]
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=600  # Las imágenes pueden tardar más
-        )
+        diff_ids = await self._image_layers(image_name)
+        # El análisis de capas no depende de la base de datos de vulnerabilidades
+        version = (await self.tool_version() or "").split("Vulnerability DB")[0].strip() or None
+        seen = await asyncio.to_thread(self._load_layer_index, diff_ids, version)
         
-        if result.returncode != 0:
-            return {
-                "status": "error",
-                "message": f"Trivy image scan failed: {result.stderr}",
-                "findings": []
-            }
+        findings = LayerFindingStream(self)
+        result = await run_command(cmd, timeout=600, on_stdout=findings.feed)  # Las imágenes pueden tardar más
         
-        findings = self.parse_results(result.stdout)
+        if result.returncode != 0:
+            return self._error_result(f"Trivy image scan failed: {result.stderr}")
         
-        return {
-            "status": "completed",
-            "tool": self.name,
-            "findings": findings,
-            "summary": {
-                "total_findings": len(findings),
-                "critical": len([f for f in findings if f.get("severity") == "critical"]),
-                "high": len([f for f in findings if f.get("severity") == "high"]),
-                "medium": len([f for f in findings if f.get("severity") == "medium"]),
-                "low": len([f for f in findings if f.get("severity") == "low"])
-            }
-        }
+        scan_result = self._build_result(findings.close())
+        if diff_ids:
+            await asyncio.to_thread(self._save_layer_index, diff_ids, seen, version)
+            scan_result["summary"]["layers"] = [
+                {"diff_id": diff_id, "cached": cached, "findings": findings.by_layer.get(diff_id, 0)}
+                for diff_id, cached in zip(diff_ids, seen)
+            ]
+            scan_result["summary"]["cached_layers"] = sum(seen)
+        return scan_result
+    
+    async def _image_layers(self, image_name: str) -> List[str]:
+        """DiffIDs de las capas de una imagen local, de la base a la superior"""
+        cmd = ["docker", "image", "inspect", "--format", "{{json .RootFS.Layers}}", image_name]
+        try:
+            result = await run_command(cmd, timeout=30)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.debug(f"Could not inspect layers of {image_name}: {str(e)}")
+            return []
+        if result.returncode != 0:
+            return []
+        try:
+            layers = json.loads(result.stdout)
+        except ValueError:
+            return []
+        return [layer for layer in layers or [] if isinstance(layer, str)]
+    
+    def _layer_index_path(self, diff_id: str) -> str:
+        return data_path("trivy-layers", f"{key_digest(diff_id)}.json")
+    
+    def _load_layer_index(self, diff_ids: List[str], version: Optional[str]) -> List[bool]:
+        """Indicar qué capas se analizaron ya con esta versión de Trivy"""
+        seen = []
+        for diff_id in diff_ids:
+            entry = read_json(self._layer_index_path(diff_id)) or {}
+            seen.append(version is not None and entry.get("tool_version") == version)
+        return seen
+    
+    def _save_layer_index(self, diff_ids: List[str], seen: List[bool], version: Optional[str]):
+        """Registrar las capas analizadas por primera vez"""
+        if version is None:
+            return
+        for diff_id, cached in zip(diff_ids, seen):
+            if not cached:
+                write_json_atomic(self._layer_index_path(diff_id), {
+                    "diff_id": diff_id,
+                    "tool_version": version
+                })
     
     def parse_results(self, raw_output: str) -> List[Dict[str, Any]]:
         """Parsear resultados JSON de Trivy"""
@@ -245,20 +867,10 @@ class TrivyScanner(SecurityScanner):
                 return []
             
             for result in results:
-                vulnerabilities = result.get("Vulnerabilities", [])
-                target = result.get("Target", "Unknown")
+                vulnerabilities = result.get("Vulnerabilities") or []
                 
                 for vuln in vulnerabilities:
-                    finding = {
-                        "tool": self.name,
-                        "severity": vuln.get("Severity", "unknown").lower(),
-                        "category": "Dependency Vulnerability",
-                        "description": vuln.get("Description", vuln.get("Title", "No description")),
-                        "location": f"{target} - {vuln.get('PkgName', 'Unknown package')}",
-                        "solution": vuln.get("FixedVersion", "No fix available"),
-                        "cve_id": vuln.get("VulnerabilityID", None)
-                    }
-                    findings.append(finding)
+                    findings.append(self._normalize(result, vuln))
             
             return findings
             
@@ -268,82 +880,158 @@ class TrivyScanner(SecurityScanner):
         except Exception as e:
             logger.error(f"Error processing Trivy results: {str(e)}")
             return []
+    
+    def _normalize(self, context: Dict[str, Any], vuln: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertir una vulnerabilidad de Trivy en hallazgo (el contexto aporta el Target)"""
+        return {
+            "tool": self.name,
+            "severity": vuln.get("Severity", "unknown").lower(),
+            "category": "Dependency Vulnerability",
+            "description": vuln.get("Description", vuln.get("Title", "No description")),
+            "location": f"{context.get('Target', 'Unknown')} - {vuln.get('PkgName', 'Unknown package')}",
+            "solution": vuln.get("FixedVersion", "No fix available"),
+            "cve_id": vuln.get("VulnerabilityID", None)
+        }
+
+class GitleaksError(Exception):
+    """Gitleaks o git terminaron con un código de error"""
 
 class GitleaksScanner(SecurityScanner):
-    """Scanner para secretos usando Gitleaks"""
+    """Scanner para secretos usando Gitleaks
+
+    Por defecto se escanea el árbol de trabajo (`--no-git`). Con
+    `history=True` el objetivo debe ser un repositorio git y se escanea su
+    historial: se guarda por repositorio el último commit escaneado y los
+    escaneos siguientes sólo recorren los commits nuevos (`ultimo..HEAD`).
+    Los hallazgos se guardan por commit, archivo, línea y regla, así que se
+    conservan entre escaneos incrementales. Si el historial se reescribe
+    (el último commit deja de ser ancestro de HEAD) o cambia la versión de
+    Gitleaks, se vuelve a escanear el historial completo.
+    """
     
-    def __init__(self):
+    VERSION_COMMAND = ["gitleaks", "version"]
+    
+    def __init__(self, history: bool = False, timeout: float = 300):
         super().__init__()
         self.name = "Gitleaks"
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ValueError("timeout must be a positive number")
+        self.history = history
+        self.timeout = min(timeout, SECRETS_MAX_TIMEOUT)
     
-    def scan(self, target: str, scan_type: str = "secrets") -> Dict[str, Any]:
+    async def scan_async(self, target: str, scan_type: str = "secrets") -> Dict[str, Any]:
         """Ejecutar escaneo de secretos con Gitleaks"""
         try:
-            # Crear archivo temporal para resultados
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-                temp_path = temp_file.name
+            if self.history:
+                return await self._scan_history(target)
+            
+            secrets = await self._run_detect(target, ["--no-git"])
+            
+            return self._build_result([self._normalize({}, secret) for secret in secrets])
             
+        except GitleaksError as e:
+            return self._error_result(str(e))
+        except asyncio.TimeoutError:
+            return self._error_result("Gitleaks scan timed out")
+        except Exception as e:
+            logger.error(f"Gitleaks scan error: {str(e)}")
+            return self._error_result(f"Gitleaks scan failed: {str(e)}")
+    
+    async def _run_detect(self, target: str, extra_args: List[str]) -> List[Dict[str, Any]]:
+        """Ejecutar gitleaks detect y devolver los secretos del informe sin normalizar"""
+        # Crear archivo temporal para resultados
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
+            temp_path = temp_file.name
+        
+        try:
             cmd = [
                 "gitleaks",
                 "detect",
                 "--source", target,
                 "--report-format", "json",
                 "--report-path", temp_path,
-                "--no-git"
+                *extra_args
             ]
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
+            result = await run_command(cmd, timeout=self.timeout)
             
             # Gitleaks retorna código 1 si encuentra secretos, esto es normal
             if result.returncode not in [0, 1]:
-                os.unlink(temp_path)
-                return {
-                    "status": "error",
-                    "message": f"Gitleaks scan failed: {result.stderr}",
-                    "findings": []
-                }
-            
-            # Leer resultados del archivo temporal
-            findings = []
-            if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
-                with open(temp_path, 'r') as f:
-                    raw_output = f.read()
-                findings = self.parse_results(raw_output)
+                raise GitleaksError(f"Gitleaks scan failed: {result.stderr}")
             
+            # Leer resultados del archivo temporal por fragmentos
+            return await asyncio.to_thread(self._read_report, temp_path)
+        finally:
             # Limpiar archivo temporal
-            os.unlink(temp_path)
-            
-            return {
-                "status": "completed",
-                "tool": self.name,
-                "findings": findings,
-                "summary": {
-                    "total_findings": len(findings),
-                    "critical": len([f for f in findings if f.get("severity") == "critical"]),
-                    "high": len([f for f in findings if f.get("severity") == "high"]),
-                    "medium": len([f for f in findings if f.get("severity") == "medium"]),
-                    "low": len([f for f in findings if f.get("severity") == "low"])
-                }
-            }
-            
-        except subprocess.TimeoutExpired:
-            return {
-                "status": "error",
-                "message": "Gitleaks scan timed out",
-                "findings": []
-            }
-        except Exception as e:
-            logger.error(f"Gitleaks scan error: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"Gitleaks scan failed: {str(e)}",
-                "findings": []
-            }
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    
+    async def pin_digest(self, scan_type: str, target: str) -> Optional[str]:
+        """En modo historial el contenido lo fijan HEAD y las refs, sin recorrer el árbol"""
+        if self.pinned_digest is None and self.history and os.path.isdir(target):
+            try:
+                head = await self._git(target, "rev-parse", "--verify", "HEAD")
+                refs = await self._git(target, "show-ref")
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.debug(f"Could not read git refs of {target}: {str(e)}")
+                return None
+            if head.returncode == 0:
+                refs = hashlib.sha256(refs.stdout.encode()).hexdigest()
+                self.pinned_digest = f"git:{head.stdout.strip()}:{refs}"
+        return self.pinned_digest
+    
+    async def _git(self, target: str, *args: str) -> CommandResult:
+        return await run_command(["git", "-C", target, *args], timeout=60)
+    
+    async def _scan_history(self, target: str) -> Dict[str, Any]:
+        """Escanear sólo los commits posteriores al último escaneado"""
+        head = await self._git(target, "rev-parse", "--verify", "HEAD")
+        if head.returncode != 0:
+            raise GitleaksError(f"Not a git repository with commits: {target}")
+        head = head.stdout.strip()
+        
+        # Sin estado por ruta (objetivo temporal) se escanea siempre el historial completo
+        manifest_path = data_path("gitleaks", f"{key_digest(os.path.abspath(target))}.json") if self.path_state else None
+        manifest = (manifest_path and await asyncio.to_thread(read_json, manifest_path)) or {}
+        
+        # El watermark sólo vale con la misma versión y si el historial no se reescribió
+        version = await self.tool_version()
+        last_commit = manifest.get("last_commit") if version is not None and manifest.get("tool_version") == version else None
+        if last_commit and last_commit != head:
+            ancestor = await self._git(target, "merge-base", "--is-ancestor", last_commit, head)
+            if ancestor.returncode != 0:
+                logger.info(f"History of {target} was rewritten, rescanning all commits")
+                last_commit = None
+        previous = manifest.get("findings", {}) if last_commit else {}
+        
+        new_commits = 0
+        if last_commit != head:
+            log_range = f"{last_commit}..{head}" if last_commit else head
+            count = await self._git(target, "rev-list", "--count", log_range)
+            new_commits = int(count.stdout.strip() or 0) if count.returncode == 0 else 0
+            secrets = await self._run_detect(target, ["--log-opts", log_range])
+            for secret in secrets:
+                previous[self._finding_key(secret)] = self._normalize({}, secret)
+        
+        if manifest_path is not None:
+            await asyncio.to_thread(write_json_atomic, manifest_path, {
+                "target": os.path.abspath(target),
+                "tool_version": version,
+                "last_commit": head,
+                "findings": previous
+            })
+        
+        result = self._build_result(list(previous.values()))
+        result["summary"]["history"] = {
+            "last_commit": head,
+            "scanned_commits": new_commits,
+            "full_scan": last_commit is None
+        }
+        return result
+    
+    def _finding_key(self, secret: Dict[str, Any]) -> str:
+        """Clave estable de un hallazgo del historial: commit, archivo, línea y regla"""
+        return ":".join(str(secret.get(field, "")) for field in ("Commit", "File", "StartLine", "RuleID"))
     
     def parse_results(self, raw_output: str) -> List[Dict[str, Any]]:
         """Parsear resultados JSON de Gitleaks"""
@@ -357,16 +1045,7 @@ class GitleaksScanner(SecurityScanner):
             # Gitleaks retorna una lista de secretos encontrados
             if isinstance(data, list):
                 for secret in data:
-                    finding = {
-                        "tool": self.name,
-                        "severity": "high",  # Los secretos siempre son de alta severidad
-                        "category": "Secret Exposure",
-                        "description": f"Secret detected: {secret.get('Description', 'Unknown secret type')}",
-                        "location": f"{secret.get('File', 'Unknown')}:{secret.get('StartLine', 0)}",
-                        "solution": "Remove or encrypt the secret, rotate if necessary",
-                        "cve_id": None
-                    }
-                    findings.append(finding)
+                    findings.append(self._normalize({}, secret))
             
             return findings
             
@@ -376,20 +1055,491 @@ class GitleaksScanner(SecurityScanner):
         except Exception as e:
             logger.error(f"Error processing Gitleaks results: {str(e)}")
             return []
+    
+    def _read_report(self, report_path: str) -> List[Dict[str, Any]]:
+        """Leer los secretos del informe de Gitleaks de forma incremental"""
+        secrets = []
+        try:
+            with open(report_path, 'rb') as f:
+                for _, secret in iter_json_items(f, self.STREAM_PATH):
+                    if isinstance(secret, dict):
+                        secrets.append(secret)
+        except JSONStreamError as e:
+            logger.error(f"Error parsing Gitleaks JSON: {str(e)}")
+            return []
+        return secrets
+    
+    def _location(self, secret: Dict[str, Any]) -> str:
+        """Archivo y línea; en el historial también el commit donde aparece"""
+        location = f"{secret.get('File', 'Unknown')}:{secret.get('StartLine', 0)}"
+        if secret.get("Commit"):
+            location += f"@{secret['Commit'][:12]}"
+        return location
+    
+    def _normalize(self, context: Dict[str, Any], secret: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertir un secreto de Gitleaks en hallazgo"""
+        return {
+            "tool": self.name,
+            "severity": "high",  # Los secretos siempre son de alta severidad
+            "category": "Secret Exposure",
+            "description": f"Secret detected: {secret.get('Description', 'Unknown secret type')}",
+            "location": self._location(secret),
+            "solution": "Remove or encrypt the secret, rotate if necessary",
+            "cve_id": None
+        }
+
+class SecretRule(NamedTuple):
+    """Regla de detección de secretos del motor nativo"""
+    rule_id: str
+    description: str
+    keywords: Tuple[bytes, ...]     # En minúsculas; al menos una debe aparecer en la línea
+    pattern: "re.Pattern"           # El grupo 1 (o el match completo) es el secreto
+    min_entropy: float = 0.0
+
+# Subconjunto de las reglas por defecto de Gitleaks
+SECRET_RULES: Tuple[SecretRule, ...] = (
+    SecretRule("aws-access-token", "AWS Access Key", (b"akia", b"asia", b"abia", b"acca", b"a3t"),
+               re.compile(rb"\b((?:A3T[A-Z0-9]|AKIA|ASIA|ABIA|ACCA)[A-Z0-9]{16})\b")),
+    SecretRule("github-pat", "GitHub Personal Access Token", (b"ghp_",), re.compile(rb"ghp_[0-9a-zA-Z]{36}")),
+    SecretRule("github-fine-grained-pat", "GitHub Fine-Grained Personal Access Token", (b"github_pat_",),
+               re.compile(rb"github_pat_[0-9a-zA-Z_]{82}")),
+    SecretRule("github-oauth", "GitHub OAuth Access Token", (b"gho_",), re.compile(rb"gho_[0-9a-zA-Z]{36}")),
+    SecretRule("github-app-token", "GitHub App Token", (b"ghu_", b"ghs_"), re.compile(rb"(?:ghu|ghs)_[0-9a-zA-Z]{36}")),
+    SecretRule("gitlab-pat", "GitLab Personal Access Token", (b"glpat-",), re.compile(rb"glpat-[0-9a-zA-Z\-_]{20}")),
+    SecretRule("slack-token", "Slack token", (b"xoxb-", b"xoxa-", b"xoxp-", b"xoxr-", b"xoxs-"),
+               re.compile(rb"xox[baprs]-[0-9a-zA-Z-]{10,48}")),
+    SecretRule("stripe-access-token", "Stripe Access Token", (b"sk_", b"rk_"),
+               re.compile(rb"\b((?:sk|rk)_(?:test|live|prod)_[0-9a-zA-Z]{10,99})\b")),
+    SecretRule("gcp-api-key", "GCP API key", (b"aiza",), re.compile(rb"\b(AIza[0-9A-Za-z\-_]{35})\b")),
+    SecretRule("openai-api-key", "OpenAI API Key", (b"t3blbkfj",),
+               re.compile(rb"\b(sk-[a-zA-Z0-9]{20}T3BlbkFJ[a-zA-Z0-9]{20})\b")),
+    SecretRule("private-key", "Private Key", (b"-----begin",),
+               re.compile(rb"-----BEGIN[ A-Z0-9_-]{0,100}PRIVATE KEY(?: BLOCK)?-----")),
+    SecretRule("jwt", "JSON Web Token", (b"eyj",),
+               re.compile(rb"\b(ey[a-zA-Z0-9]{17,}\.ey[a-zA-Z0-9/\\_-]{17,}\.(?:[a-zA-Z0-9/\\_-]{10,}={0,2})?)")),
+    SecretRule("generic-api-key", "Generic API Key",
+               (b"key", b"api", b"token", b"secret", b"password", b"passwd", b"pwd", b"auth"),
+               re.compile(rb"(?i)(?:key|api|token|secret|password|passwd|pwd|auth)[\w.-]{0,25}[\"']?\s*(?:=|:=|:|=>)\s*[\"']?([0-9a-zA-Z\-_.=+/]{10,150})"),
+               min_entropy=3.5),
+)
+
+def _keyword_pattern(keywords) -> "re.Pattern":
+    """Alternativa de palabras clave agrupada por primer byte
+
+    Se aplica sobre texto ya en minúsculas: con re.IGNORECASE el motor de
+    expresiones regulares es unas diez veces más lento.
+    """
+    groups: Dict[bytes, List[bytes]] = {}
+    for keyword in sorted(keywords, key=len, reverse=True):
+        groups.setdefault(keyword[:1], []).append(keyword[1:])
+    return re.compile(b"|".join(
+        re.escape(first) + b"(?:" + b"|".join(re.escape(rest) for rest in rests) + b")"
+        for first, rests in sorted(groups.items())
+    ))
+
+# Prefiltro multipatrón: una sola pasada por archivo con todas las palabras clave
+_SECRET_KEYWORDS = _keyword_pattern({keyword for rule in SECRET_RULES for keyword in rule.keywords})
+_KEYWORD_MAX_LEN = max(len(keyword) for rule in SECRET_RULES for keyword in rule.keywords)
+_RULES_BY_KEYWORD: Dict[bytes, List[SecretRule]] = {}
+for _rule in SECRET_RULES:
+    for _keyword in _rule.keywords:
+        _RULES_BY_KEYWORD.setdefault(_keyword, []).append(_rule)
+
+# Archivos mayores se omiten (como --max-target-megabytes de Gitleaks)
+SECRET_MAX_FILE_SIZE = 100 * 1024 * 1024
+
+# Ventana del archivo que se pasa a minúsculas de una vez para el prefiltro
+SECRET_WINDOW_SIZE = 4 * 1024 * 1024
+
+def _shannon_entropy(data: bytes) -> float:
+    if not data:
+        return 0.0
+    counts = {}
+    for byte in data:
+        counts[byte] = counts.get(byte, 0) + 1
+    return -sum(count / len(data) * math.log2(count / len(data)) for count in counts.values())
+
+def _scan_secret_file(path: str) -> List[Dict[str, Any]]:
+    """Buscar secretos en un archivo mapeado en memoria (formato del informe de Gitleaks)"""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or size > SECRET_MAX_FILE_SIZE:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Archivos binarios: se omiten como hace Gitleaks
+                if data.find(b"\0", 0, 8192) != -1:
+                    return []
+                return _match_secrets(data, path)
+    except (OSError, ValueError):
+        return []
+
+def _keyword_hits(data) -> Iterator[Tuple[int, int, bytes]]:
+    """Posiciones (inicio, fin, palabra clave) del prefiltro, ventana a ventana"""
+    for offset in range(0, len(data), SECRET_WINDOW_SIZE):
+        # Solapamiento para no perder palabras clave partidas entre ventanas
+        window = data[offset:offset + SECRET_WINDOW_SIZE + _KEYWORD_MAX_LEN - 1].lower()
+        for hit in _SECRET_KEYWORDS.finditer(window):
+            if hit.start() >= SECRET_WINDOW_SIZE:
+                break
+            yield offset + hit.start(), offset + hit.end(), hit.group()
+
+def _match_secrets(data, path: str) -> List[Dict[str, Any]]:
+    secrets = []
+    checked = set()
+    line_number = 1
+    counted_to = 0
+    for start, end, keyword in _keyword_hits(data):
+        line_start = data.rfind(b"\n", 0, start) + 1
+        line_end = data.find(b"\n", end)
+        if line_end == -1:
+            line_end = len(data)
+        for rule in _RULES_BY_KEYWORD[keyword]:
+            if (rule.rule_id, line_start) in checked:
+                continue
+            checked.add((rule.rule_id, line_start))
+            for match in rule.pattern.finditer(data, line_start, line_end):
+                secret = match.group(1) if rule.pattern.groups else match.group()
+                if rule.min_entropy and _shannon_entropy(secret) < rule.min_entropy:
+                    continue
+                # Los hits llegan en orden: los saltos de línea se cuentan una sola vez
+                line_number += data[counted_to:line_start].count(b"\n")
+                counted_to = line_start
+                secrets.append({
+                    "Description": rule.description,
+                    "RuleID": rule.rule_id,
+                    "File": path,
+                    "StartLine": line_number,
+                    "StartColumn": match.start() - line_start + 1,
+                    "Entropy": round(_shannon_entropy(secret), 4),
+                    "Commit": ""
+                })
+    return secrets
+
+def _scan_secret_files(paths: List[str]) -> List[Dict[str, Any]]:
+    """Escanear un lote de archivos (se ejecuta en un proceso del pool)"""
+    secrets = []
+    for path in paths:
+        secrets.extend(_scan_secret_file(path))
+    return secrets
+
+# Procesos del pool compartido por todos los escaneos de secretos nativos
+SECRETS_POOL_WORKERS = int(os.getenv("SECRETS_POOL_WORKERS", "0")) or os.cpu_count() or 1
+
+_secrets_pool: Optional[ProcessPoolExecutor] = None
+_secrets_pool_lock = threading.Lock()
+
+def _get_secrets_pool() -> ProcessPoolExecutor:
+    """Pool de procesos de larga duración (se crea en el primer uso)"""
+    global _secrets_pool
+    with _secrets_pool_lock:
+        if _secrets_pool is None:
+            _secrets_pool = ProcessPoolExecutor(max_workers=SECRETS_POOL_WORKERS)
+        return _secrets_pool
+
+def _discard_secrets_pool(pool: ProcessPoolExecutor):
+    """Descartar un pool roto (un proceso murió) sin esperar a sus procesos"""
+    global _secrets_pool
+    with _secrets_pool_lock:
+        if _secrets_pool is pool:
+            _secrets_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_secrets_pool():
+    """Detener el pool de procesos del motor de secretos (bloquea: no llamar desde el event loop)"""
+    global _secrets_pool
+    with _secrets_pool_lock:
+        pool, _secrets_pool = _secrets_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+class NativeSecretsScanner(GitleaksScanner):
+    """Motor de secretos nativo, sin binario externo ni archivo de informe
+
+    Cada archivo se mapea en memoria y se recorre una sola vez con un
+    prefiltro que busca a la vez las palabras clave de todas las reglas;
+    sólo en las líneas con alguna palabra clave se aplican las expresiones
+    regulares (y el umbral de entropía) de las reglas correspondientes. Los
+    archivos se reparten en lotes entre un pool de procesos compartido por
+    todos los escaneos (`jobs` lotes a la vez por escaneo). Los hallazgos
+    tienen la misma forma que los de GitleaksScanner.
+    """
+    
+    # Por debajo de este número de archivos no compensa arrancar procesos
+    INLINE_MAX_FILES = 64
+    
+    # Archivos por tarea enviada al pool
+    BATCH_SIZE = 64
+    
+    def __init__(self, jobs: Optional[int] = None, timeout: float = 300):
+        super().__init__(timeout=timeout)
+        self.name = "Secrets"
+        if jobs is not None and (not isinstance(jobs, int) or jobs < 1):
+            raise ValueError("jobs must be a positive integer")
+        self.jobs = jobs or os.cpu_count() or 1
+    
+    @property
+    def rule_config(self) -> str:
+        return "native"
+    
+    async def tool_version(self) -> Optional[str]:
+        """La versión del motor es la de su conjunto de reglas"""
+        digest = hashlib.sha256(repr([(r.rule_id, r.pattern.pattern, r.min_entropy) for r in SECRET_RULES]).encode())
+        return f"native-{digest.hexdigest()[:12]}"
+    
+    async def scan_async(self, target: str, scan_type: str = "secrets") -> Dict[str, Any]:
+        """Escanear secretos en un archivo o directorio"""
+        if not os.path.exists(target):
+            return self._error_result(f"Target not found: {target}")
+        try:
+            paths = await asyncio.to_thread(self._list_files, target)
+            secrets = await asyncio.wait_for(self._scan_files(paths), self.timeout)
+            result = self._build_result([self._normalize({}, secret) for secret in secrets])
+            result["summary"]["scanned_files"] = len(paths)
+            return result
+        except asyncio.TimeoutError:
+            return self._error_result("Secrets scan timed out")
+        except Exception as e:
+            logger.error(f"Native secrets scan error: {str(e)}")
+            return self._error_result(f"Secrets scan failed: {str(e)}")
+    
+    def _list_files(self, target: str) -> List[str]:
+        """Archivos regulares del objetivo (sin .git)"""
+        if os.path.isfile(target):
+            return [target]
+        paths = []
+        for root, dirs, files in os.walk(target):
+            dirs[:] = sorted(d for d in dirs if d != ".git")
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    paths.append(path)
+        return paths
+    
+    async def _scan_files(self, paths: List[str]) -> List[Dict[str, Any]]:
+        if len(paths) <= self.INLINE_MAX_FILES or self.jobs == 1:
+            return await asyncio.to_thread(_scan_secret_files, paths)
+        
+        loop = asyncio.get_running_loop()
+        pool = _get_secrets_pool()
+        # Como mucho `jobs` lotes en el pool: al cancelar sólo terminan los que ya corren
+        semaphore = asyncio.Semaphore(self.jobs)
+        
+        async def run_batch(batch: List[str]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await loop.run_in_executor(pool, _scan_secret_files, batch)
+        
+        batches = [paths[start:start + self.BATCH_SIZE] for start in range(0, len(paths), self.BATCH_SIZE)]
+        try:
+            results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        except BrokenProcessPool:
+            _discard_secrets_pool(pool)
+            raise
+        return [secret for batch in results for secret in batch]
+
+class AdvisoryScanner(SecurityScanner):
+    """SCA sin red: lockfiles contra el índice local de avisos (OSV)
+
+    Lee los lockfiles del objetivo (requirements, package-lock, yarn,
+    poetry, Pipfile) y consulta cada paquete en el índice de advisories.py.
+    Sirve de cribado rápido previo a Trivy; los hallazgos tienen la misma
+    forma que los de TrivyScanner.
+    """
+    
+    def __init__(self, timeout: float = 300):
+        super().__init__()
+        self.name = "Advisories"
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ValueError("timeout must be a positive number")
+        self.timeout = min(timeout, ADVISORIES_MAX_TIMEOUT)
+    
+    @property
+    def rule_config(self) -> str:
+        return "osv"
+    
+    async def tool_version(self) -> Optional[str]:
+        """La versión es la del índice de avisos (None si no está construido)"""
+        try:
+            index = await asyncio.to_thread(advisories.AdvisoryIndex)
+        except advisories.AdvisoryIndexError:
+            return None
+        index.close()
+        return f"osv-{index.version}"
+    
+    async def scan_async(self, target: str, scan_type: str = "sca") -> Dict[str, Any]:
+        """Cruzar los paquetes de los lockfiles con el índice de avisos"""
+        if not os.path.exists(target):
+            return self._error_result(f"Target not found: {target}")
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(self._scan, target), self.timeout)
+        except advisories.AdvisoryIndexError as e:
+            return self._error_result(str(e))
+        except asyncio.TimeoutError:
+            return self._error_result("Advisory scan timed out")
+        except Exception as e:
+            logger.error(f"Advisory scan error: {str(e)}")
+            return self._error_result(f"Advisory scan failed: {str(e)}")
+    
+    def _scan(self, target: str) -> Dict[str, Any]:
+        base = target if os.path.isdir(target) else os.path.dirname(target)
+        with advisories.AdvisoryIndex() as index:
+            findings = []
+            packages = 0
+            for path, file_packages in lockfiles.collect_packages(target).items():
+                seen = set()
+                for package in file_packages:
+                    if (package.ecosystem, package.name, package.version) in seen:
+                        continue
+                    seen.add((package.ecosystem, package.name, package.version))
+                    packages += 1
+                    for advisory in index.match(package.ecosystem, package.name, package.version):
+                        findings.append(self._normalize({"file": os.path.relpath(path, base), "package": package}, advisory))
+            result = self._build_result(findings)
+            result["summary"]["scanned_packages"] = packages
+            result["summary"]["advisory_index"] = index.version
+        return result
+    
+    def _normalize(self, context: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+        """Convertir un aviso en hallazgo (el contexto aporta el lockfile y el paquete)"""
+        package = context["package"]
+        cve = next((alias for alias in item["aliases"] if alias.startswith("CVE-")), None)
+        return {
+            "tool": self.name,
+            "severity": item["severity"],
+            "category": "Dependency Vulnerability",
+            "description": item["summary"] or "No description",
+            "location": f"{context['file']} - {package.name}",
+            "solution": item["fixed"] or "No fix available",
+            "cve_id": cve or item["id"]
+        }
+
+class FullScanner(SecurityScanner):
+    """Evaluación completa: SAST, SCA y secretos en paralelo sobre un mismo objetivo
+
+    Las tres herramientas comparten el objetivo ya preparado y se ejecutan a
+    la vez, de modo que el tiempo total es el de la más lenta. Los hallazgos
+    se combinan en un único resultado con el estado y el resumen de cada
+    herramienta en `summary.tools`.
+    """
+    
+    # La salida propia es el resultado combinado: sus hallazgos ya están normalizados
+    STREAM_PATH = ("findings", "*")
+    
+    # Tipo de escaneo de cada herramienta dentro de la evaluación completa
+    TOOL_SCAN_TYPES = ["sast", "sca", "secrets"]
+    
+    def __init__(
+        self,
+        sast: Optional[Dict[str, Any]] = None,
+        sca: Optional[Dict[str, Any]] = None,
+        secrets: Optional[Dict[str, Any]] = None
+    ):
+        super().__init__()
+        self.name = "Full"
+        tool_options = {"sast": sast, "sca": sca, "secrets": secrets}
+        self.scanners = [
+            (scan_type, ScannerFactory.create_scanner(scan_type, tool_options[scan_type]))
+            for scan_type in self.TOOL_SCAN_TYPES
+        ]
+    
+    def disable_path_state(self):
+        super().disable_path_state()
+        for _, scanner in self.scanners:
+            scanner.disable_path_state()
+    
+    @property
+    def rule_config(self) -> str:
+        """Configuración combinada de las herramientas"""
+        return "|".join(f"{scanner.name}:{scanner.rule_config}" for _, scanner in self.scanners)
+    
+    async def tool_version(self) -> Optional[str]:
+        """Versión combinada (None si alguna herramienta no está disponible)"""
+        versions = await asyncio.gather(*(scanner.tool_version() for _, scanner in self.scanners))
+        if any(version is None for version in versions):
+            return None
+        return "|".join(versions)
+    
+    async def scan_async(self, target: str, scan_type: str = "full") -> Dict[str, Any]:
+        """Ejecutar todas las herramientas en paralelo y combinar los resultados"""
+        if not os.path.exists(target):
+            return self._error_result(f"Target not found: {target}")
+        
+        results = await asyncio.gather(*(
+            scanner.scan_async(target, tool_scan_type) for tool_scan_type, scanner in self.scanners
+        ))
+        
+        findings = []
+        tools = {}
+        for (tool_scan_type, scanner), result in zip(self.scanners, results):
+            tools[scanner.name] = {"scan_type": tool_scan_type, "status": result["status"]}
+            if result["status"] == "completed":
+                findings.extend(result["findings"])
+                tools[scanner.name]["summary"] = result["summary"]
+            else:
+                tools[scanner.name]["message"] = result.get("message")
+        
+        failed = [name for name, tool in tools.items() if tool["status"] != "completed"]
+        if len(failed) == len(tools):
+            return self._error_result(
+                "All tools failed: " + "; ".join(f"{name}: {tools[name]['message']}" for name in failed)
+            )
+        
+        result = self._build_result(findings)
+        result["summary"]["tools"] = tools
+        if failed or any(tool["summary"].get("incomplete") for tool in tools.values() if "summary" in tool):
+            result["summary"]["incomplete"] = True
+        return result
+    
+    def _normalize(self, context: Dict[str, Any], finding: Dict[str, Any]) -> Dict[str, Any]:
+        """Los hallazgos combinados ya vienen normalizados por cada herramienta"""
+        return finding
 
 # Factory para crear escáneres
 class ScannerFactory:
     """Factory para crear instancias de escáneres"""
     
     @staticmethod
-    def create_scanner(scan_type: str) -> SecurityScanner:
-        """Crear scanner apropiado según el tipo de escaneo"""
+    def create_scanner(scan_type: str, options: Optional[Dict[str, Any]] = None) -> SecurityScanner:
+        """Crear scanner apropiado según el tipo de escaneo
+
+        Las opciones se pasan al constructor del scanner; una opción que el
+        scanner no admite o con un valor inválido produce ValueError.
+        """
+        if options is not None and not isinstance(options, dict):
+            raise ValueError("options must be an object")
+        options = options or {}
         if scan_type == "sast":
-            return SemgrepScanner()
+            return ScannerFactory._build(SemgrepScanner, options)
+        elif scan_type == "sca" and options.get("engine") is not None:
+            # {"engine": "advisories"} cruza los lockfiles con el índice OSV local
+            options = dict(options)
+            engine = options.pop("engine")
+            if engine == "advisories":
+                return ScannerFactory._build(AdvisoryScanner, options)
+            if engine != "trivy":
+                raise ValueError("engine must be 'trivy' or 'advisories'")
+            return ScannerFactory._build(TrivyScanner, options)
         elif scan_type in ["sca", "docker"]:
-            return TrivyScanner()
+            return ScannerFactory._build(TrivyScanner, options)
         elif scan_type == "secrets":
-            return GitleaksScanner()
+            # {"engine": "native"} usa el motor propio en lugar del binario de Gitleaks
+            options = dict(options)
+            engine = options.pop("engine", "gitleaks")
+            if engine == "native":
+                return ScannerFactory._build(NativeSecretsScanner, options)
+            if engine != "gitleaks":
+                raise ValueError("engine must be 'gitleaks' or 'native'")
+            return ScannerFactory._build(GitleaksScanner, options)
+        elif scan_type == "full":
+            return ScannerFactory._build(FullScanner, options)
         else:
             raise ValueError(f"Unsupported scan type: {scan_type}")
-
+    
+    @staticmethod
+    def _build(scanner_class: type, options: Dict[str, Any]) -> SecurityScanner:
+        """Instanciar el scanner comprobando antes que admite todas las opciones"""
+        accepted = set(inspect.signature(scanner_class.__init__).parameters) - {"self"}
+        unknown = sorted(set(options) - accepted)
+        if unknown:
+            raise ValueError(f"Unknown options for {scanner_class.__name__}: {', '.join(unknown)}")
+        return scanner_class(**options)
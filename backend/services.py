@@ -1,7 +1,78 @@
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import Scan, Finding
-from typing import List, Optional
+from database import Scan, Finding, ScanRollup, FindingRollup
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import base64
+import binascii
 import json
+import os
+
+# Agrupaciones admitidas en las series temporales del dashboard
+TREND_BUCKETS = ("day", "week", "month")
+TREND_MAX_DAYS = 3660
+
+# Hallazgos por INSERT (executemany) y por commit en la ingesta por lotes
+FINDINGS_CHUNK_SIZE = int(os.getenv("FINDINGS_CHUNK_SIZE", "5000"))
+
+def _finding_row(scan_id: str, finding_data: dict) -> Dict[str, Any]:
+    """Fila de la tabla findings a partir de un hallazgo normalizado"""
+    return {
+        "scan_id": scan_id,
+        "tool": finding_data.get("tool", ""),
+        "severity": finding_data.get("severity", "info"),
+        "category": finding_data.get("category"),
+        "description": finding_data.get("description", ""),
+        "location": finding_data.get("location"),
+        "solution": finding_data.get("solution"),
+        "cve_id": finding_data.get("cve_id")
+    }
+
+def encode_cursor(scan: Scan) -> str:
+    """Cursor opaco de paginación a partir del último escaneo de una página"""
+    raw = f"{scan.timestamp.isoformat()}|{scan.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(timestamp, id) codificados en un cursor (ValueError si no es válido)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, scan_pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(scan_pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+# Orden de las severidades al ordenar hallazgos por gravedad
+SEVERITY_ORDER = ("critical", "high", "medium", "low", "info")
+FINDING_SORTS = ("id", "severity")
+
+# Columnas devueltas por la API de hallazgos (sin construir objetos ORM)
+FINDING_COLUMNS = (
+    Finding.id, Finding.scan_id, Finding.tool, Finding.severity, Finding.category,
+    Finding.description, Finding.location, Finding.solution, Finding.cve_id
+)
+
+def _encode_finding_cursor(sort: str, rank: int, finding_id: int) -> str:
+    raw = f"{sort}|{rank}|{finding_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_finding_cursor(cursor: str, sort: str) -> Tuple[int, int]:
+    """(grupo de severidad, último id) de un cursor de hallazgos"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_sort, rank, finding_id = raw.split("|")
+        rank = int(rank)
+        # "id" tiene un solo grupo; "severity", uno por severidad más el del resto
+        group_count = 1 if sort == "id" else len(SEVERITY_ORDER) + 1
+        if cursor_sort != sort or not 0 <= rank < group_count:
+            raise ValueError
+        return rank, int(finding_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
 
 class ScanService:
     """Servicio para operaciones CRUD de escaneos"""
@@ -13,9 +84,11 @@ class ScanService:
             scan_id=scan_id,
             scan_type=scan_type,
             target=target,
-            status="pending"
+            status="pending",
+            timestamp=datetime.utcnow()
         )
         db.add(db_scan)
+        RollupService.increment(db, ScanRollup, {"day": db_scan.timestamp.date(), "scan_type": scan_type}, scans=1)
         db.commit()
         db.refresh(db_scan)
         return db_scan
@@ -26,87 +99,353 @@ class ScanService:
         return db.query(Scan).filter(Scan.scan_id == scan_id).first()
     
     @staticmethod
-    def get_scans(db: Session, skip: int = 0, limit: int = 100) -> List[Scan]:
-        """Obtener lista de escaneos"""
-        return db.query(Scan).offset(skip).limit(limit).all()
+    def get_scans(
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        scan_type: Optional[str] = None,
+        target: Optional[str] = None
+    ) -> Tuple[List[Scan], Optional[str]]:
+        """Obtener una página de escaneos, del más reciente al más antiguo
+
+        Paginación por cursor (keyset): el cursor codifica el (timestamp, id)
+        del último escaneo de la página anterior, así que el coste no depende
+        de cuántas páginas haya antes. Devuelve la página y el cursor de la
+        siguiente (None si es la última). Un cursor inválido produce ValueError.
+        """
+        query = db.query(Scan)
+        if status:
+            query = query.filter(Scan.status == status)
+        if scan_type:
+            query = query.filter(Scan.scan_type == scan_type)
+        if target:
+            query = query.filter(Scan.target == target)
+        if cursor:
+            timestamp, scan_pk = decode_cursor(cursor)
+            query = query.filter(or_(
+                Scan.timestamp < timestamp,
+                and_(Scan.timestamp == timestamp, Scan.id < scan_pk)
+            ))
+        
+        # Una fila de más indica si hay página siguiente
+        scans = query.order_by(Scan.timestamp.desc(), Scan.id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(scans[limit - 1]) if len(scans) > limit else None
+        return scans[:limit], next_cursor
     
     @staticmethod
-    def update_scan_status(db: Session, scan_id: str, status: str) -> Optional[Scan]:
-        """Actualizar el estado de un escaneo"""
-        db_scan = db.query(Scan).filter(Scan.scan_id == scan_id).first()
+    def update_scan_status(
+        db: Session,
+        scan_id: str,
+        status: str,
+        commit: bool = True,
+        only_from: Optional[Iterable[str]] = None
+    ) -> Optional[Scan]:
+        """Actualizar el estado de un escaneo
+
+        Con commit=False el cambio queda en la transacción del llamador (ScanWriter).
+        Con only_from sólo se aplica si el estado actual es uno de ésos; si no,
+        devuelve None como cuando el escaneo no existe.
+        """
+        query = db.query(Scan).filter(Scan.scan_id == scan_id)
+        if only_from is not None:
+            query = query.filter(Scan.status.in_(list(only_from)))
+        db_scan = query.first()
         if db_scan:
             db_scan.status = status
-            db.commit()
-            db.refresh(db_scan)
+            if commit:
+                db.commit()
+                db.refresh(db_scan)
+            else:
+                db.flush()
         return db_scan
     
     @staticmethod
-    def update_scan_results(db: Session, scan_id: str, findings: List[dict], summary: dict) -> Optional[Scan]:
-        """Actualizar los resultados de un escaneo"""
+    def update_scan_results(
+        db: Session,
+        scan_id: str,
+        findings: Iterable[dict],
+        summary: dict,
+        chunk_size: Optional[int] = None,
+        commit: bool = True
+    ) -> Optional[Scan]:
+        """Actualizar los resultados de un escaneo
+
+        Los hallazgos se insertan por lotes (ver bulk_insert_findings) y el
+        escaneo pasa a "completed" en la última transacción, cuando ya están
+        todos guardados, junto con la actualización de los rollups. Con
+        commit=False todo queda en la transacción del llamador.
+        """
         db_scan = db.query(Scan).filter(Scan.scan_id == scan_id).first()
         if db_scan:
-            # Actualizar estado y resumen
-            db_scan.status = "completed"
-            db_scan.set_summary_dict(summary)
-            
-            # Eliminar findings anteriores
-            db.query(Finding).filter(Finding.scan_id == scan_id).delete()
+            counts = Counter()
+            counts.subtract(ScanService.clear_findings(db, db_scan))
             
-            # Agregar nuevos findings
-            for finding_data in findings:
-                db_finding = Finding(
-                    scan_id=scan_id,
-                    tool=finding_data.get("tool", ""),
-                    severity=finding_data.get("severity", "info"),
-                    category=finding_data.get("category"),
-                    description=finding_data.get("description", ""),
-                    location=finding_data.get("location"),
-                    solution=finding_data.get("solution"),
-                    cve_id=finding_data.get("cve_id")
-                )
-                db.add(db_finding)
+            # Agregar nuevos findings sin construir objetos ORM
+            ScanService.bulk_insert_findings(db, scan_id, findings, chunk_size, counts, commit)
             
+            ScanService.complete_scan(db, db_scan, summary, counts, commit)
+        return db_scan
+    
+    @staticmethod
+    def clear_findings(db: Session, db_scan: Scan) -> Counter:
+        """Eliminar los hallazgos anteriores de un escaneo
+
+        Si el escaneo ya estaba completado devuelve sus hallazgos por
+        (herramienta, severidad), que dejan de contar en los rollups.
+        """
+        previous = Counter()
+        if db_scan.status == "completed":
+            previous.update(dict(
+                ((tool, severity), count) for tool, severity, count in
+                db.query(Finding.tool, Finding.severity, func.count(Finding.id))
+                .filter(Finding.scan_id == db_scan.scan_id)
+                .group_by(Finding.tool, Finding.severity)
+            ))
+        db.execute(delete(Finding).where(Finding.scan_id == db_scan.scan_id))
+        return previous
+    
+    @staticmethod
+    def complete_scan(db: Session, db_scan: Scan, summary: dict, counts: Counter, commit: bool = True) -> Scan:
+        """Marcar un escaneo como completado con su resumen y sumar `counts` a los rollups
+
+        Se llama cuando ya están guardados todos sus hallazgos.
+        """
+        db_scan.status = "completed"
+        db_scan.set_summary_dict(summary)
+        RollupService.add_findings(db, db_scan.timestamp.date(), db_scan.scan_type, counts)
+        if commit:
             db.commit()
             db.refresh(db_scan)
+        else:
+            db.flush()
         return db_scan
+    
+    @staticmethod
+    def bulk_insert_findings(
+        db: Session,
+        scan_id: str,
+        findings: Iterable[dict],
+        chunk_size: Optional[int] = None,
+        counts: Optional[Counter] = None,
+        commit: bool = True
+    ) -> int:
+        """Insertar hallazgos con INSERT por lotes (executemany) y un commit por lote
+
+        Cada lote es una transacción corta, de modo que SQLite no queda
+        bloqueado para escritura durante toda la ingesta (con commit=False
+        los lotes van en la transacción del llamador). Devuelve el número
+        de hallazgos insertados; si se pasa `counts`, acumula en él los
+        hallazgos por (herramienta, severidad).
+        """
+        chunk_size = chunk_size or FINDINGS_CHUNK_SIZE
+        statement = insert(Finding.__table__)
+        rows = (_finding_row(scan_id, finding) for finding in findings)
+        inserted = 0
+        while chunk := list(islice(rows, chunk_size)):
+            db.execute(statement, chunk)
+            if commit:
+                db.commit()
+            inserted += len(chunk)
+            if counts is not None:
+                counts.update((row["tool"], row["severity"]) for row in chunk)
+        return inserted
+
+class RollupService:
+    """Mantenimiento de los contadores agregados (rollups) por día
+
+    Los rollups se actualizan dentro de la transacción del llamador, así que
+    quedan confirmados junto con el escaneo que los modifica.
+    """
+    
+    @staticmethod
+    def increment(db: Session, model, keys: Dict[str, Any], **deltas: int):
+        """Sumar `deltas` a la fila de `keys` (creándola si no existe)"""
+        table = model.__table__
+        dialect = db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            upsert = (sqlite if dialect == "sqlite" else postgresql).insert(table).values(**keys, **deltas)
+            db.execute(upsert.on_conflict_do_update(
+                index_elements=list(keys),
+                set_={column: table.c[column] + upsert.excluded[column] for column in deltas}
+            ))
+            return
+        updated = db.execute(
+            update(table)
+            .where(*(table.c[column] == value for column, value in keys.items()))
+            .values({column: table.c[column] + delta for column, delta in deltas.items()})
+        )
+        if updated.rowcount == 0:
+            db.execute(insert(table).values(**keys, **deltas))
+    
+    @staticmethod
+    def add_findings(db: Session, day: date, scan_type: str, counts: Counter):
+        """Sumar hallazgos por (herramienta, severidad) al rollup de un día"""
+        for (tool, severity), count in counts.items():
+            if count:
+                RollupService.increment(
+                    db, FindingRollup,
+                    {"day": day, "scan_type": scan_type, "tool": tool, "severity": severity},
+                    findings=count
+                )
+    
+    @staticmethod
+    def rebuild(db: Session) -> Dict[str, int]:
+        """Recalcular todos los rollups desde las tablas de escaneos y hallazgos
+
+        Como en las actualizaciones incrementales, los escaneos cuentan desde
+        que se crean y sus hallazgos sólo una vez completados.
+        """
+        def as_date(value):
+            return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+        
+        day = func.date(Scan.timestamp)
+        scan_rows = [
+            {"day": as_date(scan_day), "scan_type": scan_type, "scans": scans}
+            for scan_day, scan_type, scans in
+            db.query(day, Scan.scan_type, func.count(Scan.id)).group_by(day, Scan.scan_type)
+        ]
+        finding_rows = [
+            {"day": as_date(scan_day), "scan_type": scan_type, "tool": tool, "severity": severity, "findings": findings}
+            for scan_day, scan_type, tool, severity, findings in
+            db.query(day, Scan.scan_type, Finding.tool, Finding.severity, func.count(Finding.id))
+            .join(Scan, Scan.scan_id == Finding.scan_id)
+            .filter(Scan.status == "completed")
+            .group_by(day, Scan.scan_type, Finding.tool, Finding.severity)
+        ]
+        
+        db.execute(delete(ScanRollup))
+        db.execute(delete(FindingRollup))
+        if scan_rows:
+            db.execute(insert(ScanRollup.__table__), scan_rows)
+        if finding_rows:
+            db.execute(insert(FindingRollup.__table__), finding_rows)
+        db.commit()
+        return {"scan_rollups": len(scan_rows), "finding_rollups": len(finding_rows)}
+    
+    @staticmethod
+    def backfill_if_empty(db: Session) -> bool:
+        """Reconstruir los rollups si están vacíos pero ya hay escaneos (bases anteriores)"""
+        if db.query(ScanRollup.day).first() is None and db.query(Scan.id).first() is not None:
+            RollupService.rebuild(db)
+            return True
+        return False
 
 class FindingService:
     """Servicio para operaciones CRUD de hallazgos"""
     
+    @staticmethod
+    def get_findings_page(
+        db: Session,
+        scan_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        severities: Optional[List[str]] = None,
+        tool: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: str = "id"
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Obtener una página de hallazgos de un escaneo como diccionarios
+
+        `sort` es "id" (orden en que se guardaron) o "severity" (de crítica a
+        informativa y, al final, severidades desconocidas). En ambos casos la
+        paginación es por cursor: cada consulta filtra por (scan_id,
+        severidad) y avanza por id, sin OFFSET. Un cursor o un orden
+        inválidos producen ValueError.
+        """
+        if sort not in FINDING_SORTS:
+            raise ValueError(f"sort must be one of: {', '.join(FINDING_SORTS)}")
+        rank, last_id = _decode_finding_cursor(cursor, sort) if cursor else (0, 0)
+        
+        query = select(*FINDING_COLUMNS).where(Finding.scan_id == scan_id)
+        if severities:
+            query = query.where(Finding.severity.in_(severities))
+        if tool:
+            query = query.where(Finding.tool == tool)
+        if category:
+            query = query.where(Finding.category == category)
+        
+        if sort == "id":
+            groups = [None]
+        else:
+            # Un grupo por severidad conocida y uno final con el resto
+            groups = [Finding.severity == severity for severity in SEVERITY_ORDER]
+            groups.append(Finding.severity.notin_(SEVERITY_ORDER))
+        
+        # Una fila de más indica si hay página siguiente
+        rows = []
+        for index in range(rank, len(groups)):
+            # Grupos que el filtro de severidad ya excluye
+            if sort == "severity" and severities and index < len(SEVERITY_ORDER) and SEVERITY_ORDER[index] not in severities:
+                continue
+            group_query = query if groups[index] is None else query.where(groups[index])
+            if index == rank:
+                group_query = group_query.where(Finding.id > last_id)
+            batch = db.execute(group_query.order_by(Finding.id).limit(limit + 1 - len(rows))).all()
+            rows.extend((index, row) for row in batch)
+            if len(rows) > limit:
+                break
+        
+        next_cursor = None
+        if len(rows) > limit:
+            index, row = rows[limit - 1]
+            next_cursor = _encode_finding_cursor(sort, index, row.id)
+        return [dict(row._mapping) for _, row in rows[:limit]], next_cursor
+    
     @staticmethod
     def get_findings_by_scan(db: Session, scan_id: str) -> List[Finding]:
         """Obtener todos los hallazgos de un escaneo"""
         return db.query(Finding).filter(Finding.scan_id == scan_id).all()
     
+    @staticmethod
+    def count_by_scan(db: Session, scan_ids: List[str]) -> Dict[str, int]:
+        """Número de hallazgos de varios escaneos con una sola consulta agrupada"""
+        if not scan_ids:
+            return {}
+        return dict(
+            db.query(Finding.scan_id, func.count(Finding.id))
+            .filter(Finding.scan_id.in_(scan_ids))
+            .group_by(Finding.scan_id)
+            .all()
+        )
+    
     @staticmethod
     def get_findings_by_severity(db: Session, severity: str) -> List[Finding]:
         """Obtener hallazgos por severidad"""
         return db.query(Finding).filter(Finding.severity == severity).all()
 
+    @staticmethod
+    def get_findings_by_cve(db: Session, cve_id: str) -> List[Finding]:
+        """Obtener los hallazgos de un CVE en todos los escaneos"""
+        return db.query(Finding).filter(Finding.cve_id == cve_id).order_by(Finding.id).all()
+
 class DashboardService:
     """Servicio para estadísticas del dashboard"""
     
     @staticmethod
     def get_dashboard_stats(db: Session) -> dict:
-        """Obtener estadísticas para el dashboard"""
-        # Total de escaneos
-        total_scans = db.query(Scan).count()
-        
-        # Contar por tipo de escaneo
-        scan_types = {}
-        scans = db.query(Scan).all()
-        for scan in scans:
-            scan_types[scan.scan_type] = scan_types.get(scan.scan_type, 0) + 1
+        """Obtener estadísticas para el dashboard
+
+        Los conteos salen de los rollups (coste proporcional al número de
+        días, no al de hallazgos); no se carga ninguna fila de hallazgos.
+        """
+        # Total de escaneos y conteo por tipo
+        scan_types = {
+            scan_type: int(count) for scan_type, count in
+            db.query(ScanRollup.scan_type, func.sum(ScanRollup.scans)).group_by(ScanRollup.scan_type)
+            if count
+        }
+        total_scans = sum(scan_types.values())
         
         # Contar por severidad
         severity_counts = {"critical": 0, "high": 0, "medium": 0, "low": 0, "info": 0}
-        findings = db.query(Finding).all()
-        for finding in findings:
-            if finding.severity in severity_counts:
-                severity_counts[finding.severity] += 1
+        for severity, count in db.query(FindingRollup.severity, func.sum(FindingRollup.findings)).group_by(FindingRollup.severity):
+            if severity in severity_counts:
+                severity_counts[severity] = int(count or 0)
         
-        # Escaneos recientes
+        # Escaneos recientes con su número de hallazgos
         recent_scans = db.query(Scan).order_by(Scan.timestamp.desc()).limit(5).all()
+        findings_counts = FindingService.count_by_scan(db, [scan.scan_id for scan in recent_scans])
         
         return {
             "total_scans": total_scans,
@@ -119,9 +458,121 @@ class DashboardService:
                     "target": scan.target,
                     "status": scan.status,
                     "timestamp": scan.timestamp,
-                    "findings_count": len(scan.findings)
+                    "findings_count": findings_counts.get(scan.scan_id, 0)
                 }
                 for scan in recent_scans
             ]
         }
+    
+    @staticmethod
+    def get_trends(db: Session, start: date, end: date, bucket: str = "day") -> dict:
+        """Serie temporal de escaneos y hallazgos entre `start` y `end` (inclusive)
 
+        Lee sólo los rollups diarios y los agrupa por día, semana (que empieza
+        el lunes) o mes; los periodos sin actividad aparecen con ceros.
+        """
+        if bucket not in TREND_BUCKETS:
+            raise ValueError(f"bucket must be one of: {', '.join(TREND_BUCKETS)}")
+        if start > end:
+            raise ValueError("from must not be after to")
+        if (end - start).days > TREND_MAX_DAYS:
+            raise ValueError(f"Range cannot exceed {TREND_MAX_DAYS} days")
+        
+        def bucket_start(day: date) -> date:
+            if bucket == "week":
+                return day - timedelta(days=day.weekday())
+            if bucket == "month":
+                return day.replace(day=1)
+            return day
+        
+        def next_bucket(day: date) -> date:
+            if bucket == "week":
+                return day + timedelta(days=7)
+            if bucket == "month":
+                return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+            return day + timedelta(days=1)
+        
+        series = {}
+        current = bucket_start(start)
+        while current <= end:
+            series[current] = {
+                "bucket": current.isoformat(),
+                "scans": 0,
+                "scan_types": {},
+                "findings": 0,
+                "severity": {"critical": 0, "high": 0, "medium": 0, "low": 0, "info": 0},
+                "tools": {}
+            }
+            current = next_bucket(current)
+        
+        for day, scan_type, scans in (
+            db.query(ScanRollup.day, ScanRollup.scan_type, ScanRollup.scans)
+            .filter(ScanRollup.day >= start, ScanRollup.day <= end)
+        ):
+            point = series[bucket_start(day)]
+            point["scans"] += scans
+            point["scan_types"][scan_type] = point["scan_types"].get(scan_type, 0) + scans
+        
+        for day, tool, severity, findings in (
+            db.query(FindingRollup.day, FindingRollup.tool, FindingRollup.severity, FindingRollup.findings)
+            .filter(FindingRollup.day >= start, FindingRollup.day <= end)
+        ):
+            point = series[bucket_start(day)]
+            point["findings"] += findings
+            point["severity"][severity] = point["severity"].get(severity, 0) + findings
+            point["tools"][tool] = point["tools"].get(tool, 0) + findings
+        
+        return {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "bucket": bucket,
+            "series": list(series.values())
+        }
+
+# Versiones asíncronas para los endpoints: ejecutan los mismos métodos con
+# AsyncSession.run_sync, de modo que las consultas van por el driver asíncrono
+# (aiosqlite/asyncpg) y esperarlas no bloquea el bucle de eventos
+class AsyncScanService:
+    """ScanService sobre AsyncSession"""
+    
+    @staticmethod
+    async def create_scan(db: AsyncSession, scan_id: str, scan_type: str, target: str) -> Scan:
+        return await db.run_sync(ScanService.create_scan, scan_id, scan_type, target)
+    
+    @staticmethod
+    async def get_scan(db: AsyncSession, scan_id: str) -> Optional[Scan]:
+        return await db.run_sync(ScanService.get_scan, scan_id)
+    
+    @staticmethod
+    async def get_scans(db: AsyncSession, *args, **kwargs) -> Tuple[List[Scan], Optional[str]]:
+        return await db.run_sync(ScanService.get_scans, *args, **kwargs)
+    
+    @staticmethod
+    async def update_scan_status(db: AsyncSession, scan_id: str, status: str) -> Optional[Scan]:
+        return await db.run_sync(ScanService.update_scan_status, scan_id, status)
+
+class AsyncFindingService:
+    """FindingService sobre AsyncSession"""
+    
+    @staticmethod
+    async def get_findings_page(db: AsyncSession, *args, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await db.run_sync(FindingService.get_findings_page, *args, **kwargs)
+    
+    @staticmethod
+    async def count_by_scan(db: AsyncSession, scan_ids: List[str]) -> Dict[str, int]:
+        return await db.run_sync(FindingService.count_by_scan, scan_ids)
+    
+    @staticmethod
+    async def get_findings_by_cve(db: AsyncSession, cve_id: str) -> List[Finding]:
+        return await db.run_sync(FindingService.get_findings_by_cve, cve_id)
+
+class AsyncDashboardService:
+    """DashboardService sobre AsyncSession"""
+    
+    @staticmethod
+    async def get_dashboard_stats(db: AsyncSession) -> dict:
+        return await db.run_sync(DashboardService.get_dashboard_stats)
+    
+    @staticmethod
+    async def get_trends(db: AsyncSession, start: date, end: date, bucket: str = "day") -> dict:
+        return await db.run_sync(DashboardService.get_trends, start, end, bucket)
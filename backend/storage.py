@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+# Directorio para el estado local de los escáneres (manifiestos, cachés, ...)
+DATA_DIR = os.getenv("SCANNER_DATA_DIR", "data")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def data_path(*parts: str) -> str:
+    """Ruta dentro del directorio de datos (crea los directorios intermedios)"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def hash_file(path: str) -> str:
+    """Calcular el SHA-256 de un archivo leyéndolo por bloques"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_tree_files(path: str, exclude_dirs: Iterable[str] = ()) -> Dict[str, str]:
+    """Calcular el SHA-256 de cada archivo regular de un árbol (ruta relativa -> hash)"""
+    exclude_dirs = set(exclude_dirs)
+    hashes = {}
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in exclude_dirs)
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            if os.path.islink(file_path) or not os.path.isfile(file_path):
+                continue
+            hashes[os.path.relpath(file_path, path)] = hash_file(file_path)
+    return hashes
+
+def tree_digest(path: str) -> str:
+    """Calcular un hash del contenido de un directorio (rutas relativas + contenido)"""
+    digest = hashlib.sha256()
+    for relative, file_hash in hash_tree_files(path).items():
+        digest.update(relative.encode("utf-8", errors="surrogateescape") + b"\0")
+        digest.update(file_hash.encode() + b"\n")
+    return digest.hexdigest()
+
+def key_digest(value: str) -> str:
+    """Hash corto y estable para usar un valor como nombre de archivo"""
+    return hashlib.sha256(value.encode("utf-8", errors="surrogateescape")).hexdigest()[:32]
+
+def read_json(path: str) -> Optional[Any]:
+    """Leer un JSON (None si no existe o está corrupto)"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_json_atomic(path: str, data: Any):
+    """Escribir un JSON de forma atómica (archivo temporal + rename)"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
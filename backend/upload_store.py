@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import aiofiles
+import aiofiles.os
+try:
+    from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Los archivos subidos se guardan por contenido: uploads/<sha256><extensión>
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+# Tamaño máximo de un archivo subido (por defecto 2 GiB)
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(2 * 1024 ** 3)))
+
+# Tamaño de cada bloque escrito a disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Margen sobre MAX_UPLOAD_SIZE para las cabeceras y separadores multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Retención de archivos subidos: antigüedad máxima y tamaño total del directorio
+UPLOAD_TTL_HOURS = float(os.getenv("UPLOAD_TTL_HOURS", "24"))
+UPLOAD_MAX_TOTAL_SIZE = int(os.getenv("UPLOAD_MAX_TOTAL_SIZE", str(20 * 1024 ** 3)))
+UPLOAD_PRUNE_INTERVAL = float(os.getenv("UPLOAD_PRUNE_INTERVAL", "3600"))
+
+class UploadTooLargeError(Exception):
+    """El archivo supera MAX_UPLOAD_SIZE"""
+
+class InvalidUploadError(Exception):
+    """La petición no es un multipart/form-data con el campo del archivo"""
+
+def _extension(filename: str) -> str:
+    """Extensión del archivo original (sólo caracteres seguros, p. ej. ".tar.gz")"""
+    root, extension = os.path.splitext(os.path.basename(filename or ""))
+    if root.lower().endswith(".tar"):
+        extension = ".tar" + extension
+    return extension if re.fullmatch(r"(\.[A-Za-z0-9]{1,10}){1,2}", extension) else ""
+
+class _FilePart:
+    """Parser multipart incremental que sólo conserva los datos de un campo de archivo
+
+    Cada bloque de la petición se entrega a feed(), que devuelve los bytes
+    del archivo contenidos en él; el resto de campos se descarta.
+    """
+
+    def __init__(self, boundary: bytes, field: str):
+        self.field = field.encode()
+        self.filename: Optional[str] = None
+        self.found = False
+        self.complete = False
+        self._in_file = False
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._data: List[bytes] = []
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Procesar un bloque de la petición y devolver los bytes del archivo que contenía"""
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise InvalidUploadError(f"Malformed multipart body: {str(e)}")
+        data, self._data = b"".join(self._data), []
+        return data
+
+    def _on_part_begin(self):
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._disposition)
+        # Sólo cuenta el primer campo con el nombre esperado
+        self._in_file = not self.found and params.get(b"name") == self.field
+        if self._in_file:
+            self.found = True
+            self.filename = params.get(b"filename", b"").decode("utf-8", errors="replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._data.append(data[start:end])
+
+    def _on_part_end(self):
+        self._in_file = False
+
+    def _on_end(self):
+        self.complete = True
+
+async def save_upload(
+    body: AsyncIterator[bytes],
+    content_type: str,
+    content_length: Optional[int] = None,
+    max_size: int = None,
+    field: str = "file"
+) -> Dict[str, Any]:
+    """Guardar el archivo de una petición multipart/form-data calculando su SHA-256
+
+    El cuerpo se parsea a medida que llega y el archivo se escribe
+    directamente en un temporal, sin copia intermedia: la memoria usada es
+    la de un bloque sea cual sea el tamaño. Una petición cuyo Content-Length
+    ya supera `max_size` se rechaza antes de leerla, y la lectura se aborta
+    con UploadTooLargeError en cuanto el archivo o el cuerpo lo superan. El
+    temporal se renombra a su ruta por contenido; si ese contenido ya estaba
+    guardado se descarta y se devuelve el mismo file_id.
+    """
+    max_size = MAX_UPLOAD_SIZE if max_size is None else max_size
+    too_large = f"File exceeds the maximum upload size of {max_size} bytes"
+    if content_length is not None and content_length > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLargeError(too_large)
+    media_type, params = parse_options_header(content_type)
+    if media_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise InvalidUploadError("Expected a multipart/form-data request")
+    part = _FilePart(params[b"boundary"], field)
+
+    await aiofiles.os.makedirs(UPLOAD_DIR, exist_ok=True)
+    temp_path = os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    received = 0
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            pending = bytearray()
+            async for chunk in body:
+                received += len(chunk)
+                if received > max_size + MULTIPART_OVERHEAD:
+                    raise UploadTooLargeError(too_large)
+                data = part.feed(chunk)
+                size += len(data)
+                if size > max_size:
+                    raise UploadTooLargeError(too_large)
+                digest.update(data)
+                pending += data
+                if len(pending) >= UPLOAD_CHUNK_SIZE:
+                    await buffer.write(bytes(pending))
+                    pending.clear()
+            await buffer.write(bytes(pending))
+        if not part.found or not part.complete:
+            raise InvalidUploadError(f"Missing or incomplete '{field}' field")
+
+        file_id = digest.hexdigest()
+        file_path = os.path.join(UPLOAD_DIR, f"{file_id}{_extension(part.filename)}")
+        duplicate = await aiofiles.os.path.exists(file_path)
+        if duplicate:
+            await aiofiles.os.remove(temp_path)
+            # Renovar la antigüedad para la retención de prune_uploads()
+            await asyncio.to_thread(os.utime, file_path)
+        else:
+            await aiofiles.os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    if duplicate:
+        logger.info(f"Upload {part.filename} matches stored file {file_id}")
+    return {
+        "file_id": file_id,
+        "filename": part.filename,
+        "file_path": file_path,
+        "size": size,
+        "duplicate": duplicate
+    }
+
+def prune_uploads(keep: Iterable[str] = (), now: Optional[float] = None) -> List[str]:
+    """Borrar los archivos subidos caducados y, si aún se supera el tamaño total, los más antiguos
+
+    La antigüedad cuenta desde la última subida del mismo contenido. Los
+    archivos de `keep` (objetivos de escaneos en curso) no se borran nunca.
+    """
+    if not os.path.isdir(UPLOAD_DIR):
+        return []
+    now = time.time() if now is None else now
+    keep = {os.path.abspath(path) for path in keep}
+    max_age = UPLOAD_TTL_HOURS * 3600
+    total = 0
+    candidates = []
+    for entry in os.scandir(UPLOAD_DIR):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        total += stat.st_size
+        # Las subidas en curso (.upload-*.tmp) sólo se borran si quedaron abandonadas
+        if os.path.abspath(entry.path) in keep or (entry.name.startswith(".upload-") and now - stat.st_mtime < max_age):
+            continue
+        candidates.append((stat.st_mtime, stat.st_size, entry.path))
+    candidates.sort()
+
+    removed = []
+    for mtime, size, path in candidates:
+        if now - mtime < max_age and total <= UPLOAD_MAX_TOTAL_SIZE:
+            break
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(f"Could not remove upload {path}: {str(e)}")
+            continue
+        total -= size
+        removed.append(path)
+    return removed
@@ -0,0 +1,194 @@
+"""Espacios de trabajo temporales para escanear archivos comprimidos
+
+Un .zip o .tar subido se extrae por bloques (sin cargar miembros enteros en
+memoria) en un directorio propio del escaneo, en tmpfs (/dev/shm) cuando hay
+sitio. Todas las herramientas de un escaneo comparten el árbol extraído y el
+directorio se borra al terminar el escaneo. La extracción se aborta si el
+archivo supera WORKSPACE_MAX_FILES miembros o WORKSPACE_MAX_BYTES
+descomprimidos (bombas zip) o si contiene rutas fuera del destino.
+"""
+import asyncio
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import uuid
+import zipfile
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, IO, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Límites de extracción por escaneo
+WORKSPACE_MAX_FILES = int(os.getenv("WORKSPACE_MAX_FILES", "100000"))
+WORKSPACE_MAX_BYTES = int(os.getenv("WORKSPACE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Directorio raíz de los espacios de trabajo (por defecto tmpfs si está disponible)
+WORKSPACE_DIR = os.getenv("SCAN_WORKSPACE_DIR")
+TMPFS_DIR = "/dev/shm"
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+class ArchiveError(Exception):
+    """Archivo comprimido ilegible, con rutas inseguras o que supera los límites"""
+
+def is_archive(target: str) -> bool:
+    return target.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(target)
+
+def workspace_root() -> str:
+    """Raíz de los espacios de trabajo: tmpfs si cabe una extracción completa"""
+    if WORKSPACE_DIR:
+        return WORKSPACE_DIR
+    if os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK):
+        fs = os.statvfs(TMPFS_DIR)
+        if fs.f_bavail * fs.f_frsize >= WORKSPACE_MAX_BYTES:
+            return os.path.join(TMPFS_DIR, "devsecops-workspaces")
+    return os.path.join(tempfile.gettempdir(), "devsecops-workspaces")
+
+def cleanup_stale():
+    """Borrar los espacios de trabajo que quedaron de una ejecución anterior"""
+    for root in {workspace_root(), os.path.join(tempfile.gettempdir(), "devsecops-workspaces")}:
+        if os.path.isdir(root):
+            for name in os.listdir(root):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+class _Extraction:
+    """Estado de una extracción: contadores contra los límites y señal de parada"""
+
+    def __init__(self, destination: str, max_files: int, max_bytes: int, stop: Optional[threading.Event]):
+        self.destination = os.path.realpath(destination)
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.stop = stop
+        self.files = 0
+        self.bytes = 0
+
+    def member_path(self, name: str) -> Optional[str]:
+        """Ruta de destino de un miembro (ArchiveError si sale del destino)"""
+        relative = os.path.normpath(name.replace("\\", "/").lstrip("/"))
+        if relative in (".", ""):
+            return None
+        path = os.path.normpath(os.path.join(self.destination, relative))
+        if os.path.commonpath([self.destination, path]) != self.destination:
+            raise ArchiveError(f"Unsafe path in archive: {name}")
+        return path
+
+    def copy(self, source: IO[bytes], path: str):
+        """Copiar un miembro por bloques contando los bytes reales, no los declarados"""
+        self.files += 1
+        if self.files > self.max_files:
+            raise ArchiveError(f"Archive has more than {self.max_files} files")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as target:
+            while chunk := source.read(COPY_CHUNK_SIZE):
+                if self.stop is not None and self.stop.is_set():
+                    raise ArchiveError("Extraction cancelled")
+                self.bytes += len(chunk)
+                if self.bytes > self.max_bytes:
+                    raise ArchiveError(f"Archive expands to more than {self.max_bytes} bytes")
+                target.write(chunk)
+
+def _extract_zip(archive: str, extraction: _Extraction):
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            path = extraction.member_path(info.filename)
+            if path is None:
+                continue
+            # Tipo de archivo Unix (si se guardó): sólo se extraen archivos regulares
+            file_type = stat.S_IFMT(info.external_attr >> 16)
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+            elif not file_type or file_type == stat.S_IFREG:
+                with zf.open(info) as source:
+                    extraction.copy(source, path)
+
+def _extract_tar(archive: str, extraction: _Extraction):
+    # Modo flujo ("r|*"): una sola pasada secuencial, sin índice en memoria
+    with tarfile.open(archive, "r|*") as tf:
+        for member in tf:
+            path = extraction.member_path(member.name)
+            if path is None:
+                continue
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+            elif member.isfile():
+                extraction.copy(tf.extractfile(member), path)
+            # Enlaces, dispositivos y FIFOs no se extraen
+
+def extract_archive(
+    archive: str,
+    destination: str,
+    stop: Optional[threading.Event] = None,
+    max_files: Optional[int] = None,
+    max_bytes: Optional[int] = None
+) -> Dict[str, int]:
+    """Extraer un .zip o .tar en `destination` respetando los límites"""
+    extraction = _Extraction(
+        destination,
+        max_files if max_files is not None else WORKSPACE_MAX_FILES,
+        max_bytes if max_bytes is not None else WORKSPACE_MAX_BYTES,
+        stop
+    )
+    try:
+        if zipfile.is_zipfile(archive):
+            _extract_zip(archive, extraction)
+        else:
+            _extract_tar(archive, extraction)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"Could not extract {os.path.basename(archive)}: {str(e)}")
+    return {"files": extraction.files, "bytes": extraction.bytes}
+
+def _remove_when_done(path: str):
+    def callback(future: asyncio.Future):
+        if not future.cancelled():
+            future.exception()
+        shutil.rmtree(path, ignore_errors=True)
+    return callback
+
+@asynccontextmanager
+async def extracted(archive: str, scan_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Extraer un archivo en un espacio de trabajo propio y borrarlo al salir"""
+    root = workspace_root()
+    os.makedirs(root, exist_ok=True)
+    path = tempfile.mkdtemp(dir=root, prefix=f"{scan_id or uuid.uuid4().hex}-")
+    stop = threading.Event()
+    extraction = asyncio.ensure_future(asyncio.to_thread(extract_archive, archive, path, stop))
+    try:
+        stats = await asyncio.shield(extraction)
+        logger.info(f"Extracted {archive} into {path}: {stats['files']} files, {stats['bytes']} bytes")
+        yield path
+    finally:
+        stop.set()
+        if extraction.done():
+            await asyncio.to_thread(shutil.rmtree, path, True)
+        else:
+            # Cancelado a mitad de extracción: se borra cuando el hilo se detenga
+            extraction.add_done_callback(_remove_when_done(path))
+
+def _relativize(result: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """Quitar la ruta del espacio de trabajo de las ubicaciones de los hallazgos"""
+    prefix = path.rstrip(os.sep) + os.sep
+    for finding in result.get("findings", []):
+        if isinstance(finding.get("location"), str):
+            finding["location"] = finding["location"].replace(prefix, "")
+    return result
+
+async def scan_archive(scanner, archive: str, scan_type: str, scan_id: Optional[str] = None) -> Dict[str, Any]:
+    """Escanear el contenido de un archivo comprimido en un espacio de trabajo temporal
+
+    Las ubicaciones de los hallazgos quedan relativas a la raíz del archivo,
+    de modo que no dependen del directorio temporal (ni de la caché). Los
+    modos incrementales no guardan manifiestos del directorio temporal.
+    """
+    scanner.disable_path_state()
+    try:
+        async with extracted(archive, scan_id) as path:
+            result = await scanner.scan_async(path, scan_type)
+    except ArchiveError as e:
+        return {"status": "error", "message": str(e), "findings": []}
+    return _relativize(result, path)
@@ -0,0 +1,260 @@
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from services import FINDINGS_CHUNK_SIZE, ScanService
+
+logger = logging.getLogger(__name__)
+
+# Operaciones pequeñas (cambios de estado, cierre de resultados) por transacción
+WRITER_MAX_BATCH = int(os.getenv("SCAN_WRITER_MAX_BATCH", "64"))
+
+class _Operation(NamedTuple):
+    """Escritura encolada; las exclusivas (inserción de hallazgos) van solas en su transacción"""
+    future: Future
+    method: Callable
+    args: tuple
+    exclusive: bool = False
+    cleanup: Optional[Callable] = None
+
+class _ResultsWrite:
+    """Estado compartido por las operaciones en que se divide save_results
+
+    Cada lote de hallazgos es una operación con su propio commit, para que
+    el bloqueo de escritura de SQLite se suelte entre lotes; la última
+    operación marca el escaneo como completado y aplica el delta de los
+    rollups. Si un lote falla, los siguientes no se aplican y la última
+    operación propaga su error; si ésta falla o se cancela, el escritor
+    borra los lotes ya guardados (discard) para no dejar resultados a medias.
+    """
+
+    def __init__(self, scan_id: str, summary: dict):
+        self.scan_id = scan_id
+        self.summary = summary
+        self.counts = Counter()
+        self.inserts: List[Future] = []
+        self.completion: Optional[Future] = None
+
+    def _failed(self) -> Optional[BaseException]:
+        """Error del primer lote fallido (los anteriores ya se aplicaron: el orden es el de la cola)"""
+        for future in self.inserts:
+            if future.done() and future.exception() is not None:
+                return future.exception()
+        return None
+
+    def insert(self, db: Session, findings: List[dict], first: bool, commit: bool = False) -> int:
+        """Insertar un lote de hallazgos (el primero borra antes los anteriores)"""
+        if self._failed() is not None or (self.completion is not None and self.completion.cancelled()):
+            return 0
+        db_scan = ScanService.get_scan(db, self.scan_id)
+        if db_scan is None:
+            return 0
+        if first:
+            self.counts.subtract(ScanService.clear_findings(db, db_scan))
+        return ScanService.bulk_insert_findings(db, self.scan_id, findings, max(1, len(findings)), self.counts, commit=False)
+
+    def complete(self, db: Session, commit: bool = False):
+        """Marcar el escaneo como completado una vez guardados todos los lotes"""
+        error = self._failed()
+        if error is not None:
+            raise error
+        db_scan = ScanService.get_scan(db, self.scan_id)
+        if db_scan is None:
+            return None
+        return ScanService.complete_scan(db, db_scan, self.summary, self.counts, commit=False)
+
+    def discard(self, db: Session, commit: bool = False):
+        """Borrar los hallazgos guardados si el escaneo no llega a completarse"""
+        db_scan = ScanService.get_scan(db, self.scan_id)
+        if db_scan is not None:
+            ScanService.clear_findings(db, db_scan)
+
+class ScanWriter:
+    """Escritor único de los cambios de estado y resultados de los escaneos
+
+    Los escaneos en curso no abren sesiones propias: encolan sus escrituras
+    (update_status, save_results) y un único hilo las aplica en orden de
+    llegada. Así sólo hay un escritor compitiendo por el bloqueo de SQLite.
+    Las operaciones pequeñas pendientes se agrupan en una sola transacción,
+    de modo que el coste del commit se reparte entre todos los escaneos del
+    lote: el rendimiento crece con la concurrencia en vez de hundirse por
+    contención. Los hallazgos, en cambio, se insertan en lotes de
+    FINDINGS_CHUNK_SIZE, cada uno en su propia transacción corta, para que
+    un escaneo grande no retenga el bloqueo durante toda su ingesta.
+
+    Cada operación devuelve un concurrent.futures.Future con el resultado
+    del método de ScanService (asyncio.wrap_future para esperarlo desde una
+    corutina). Si la transacción conjunta falla, sus operaciones se repiten
+    una a una para que el error sólo llegue a la que lo produjo.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_batch: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch or WRITER_MAX_BATCH)
+        self.chunk_size = max(1, chunk_size or FINDINGS_CHUNK_SIZE)
+        self._queue: "queue.Queue[Optional[_Operation]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"operations": 0, "transactions": 0, "failed": 0}
+
+    def start(self):
+        """Arrancar el hilo escritor (idempotente)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="scan-writer", daemon=True)
+            self._thread.start()
+        logger.info(f"Scan writer started: up to {self.max_batch} operations per transaction")
+
+    def shutdown(self, timeout: float = 30):
+        """Aplicar lo pendiente y detener el hilo escritor"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout=timeout)
+
+    def update_status(self, scan_id: str, status: str, only_from: Optional[Iterable[str]] = None) -> Future:
+        """Encolar un cambio de estado (condicionado al estado actual si se da only_from)"""
+        if only_from is None:
+            return self._submit(ScanService.update_scan_status, scan_id, status)
+        return self._submit(partial(ScanService.update_scan_status, only_from=tuple(only_from)), scan_id, status)
+
+    def save_results(self, scan_id: str, findings: Iterable[dict], summary: dict) -> Future:
+        """Encolar los hallazgos y el resumen de un escaneo completado
+
+        Se encola una operación por lote de hallazgos y una final que marca
+        el escaneo como completado; el Future devuelto es el de esta última.
+        Si ésta falla o se cancela, se borran los hallazgos ya guardados.
+        Los lotes sólo acotan el tamaño de cada transacción: todos los
+        hallazgos siguen en memoria hasta que se aplica el último lote.
+        """
+        findings = list(findings)
+        write = _ResultsWrite(scan_id, summary)
+        for start in range(0, max(1, len(findings)), self.chunk_size):
+            chunk = findings[start:start + self.chunk_size]
+            write.inserts.append(self._submit(write.insert, chunk, start == 0, exclusive=True))
+        write.completion = self._submit(write.complete, cleanup=write.discard)
+        return write.completion
+
+    def stats(self) -> Dict[str, int]:
+        """Operaciones aplicadas (cada lote de hallazgos cuenta como una), transacciones y fallos"""
+        with self._lock:
+            return {**self._stats, "pending": self._queue.qsize()}
+
+    def _submit(
+        self,
+        method: Callable,
+        *args: Any,
+        exclusive: bool = False,
+        cleanup: Optional[Callable] = None
+    ) -> Future:
+        self.start()
+        future = Future()
+        self._queue.put(_Operation(future, method, args, exclusive, cleanup))
+        return future
+
+    def _run(self):
+        held: Optional[_Operation] = None
+        stopping = False
+        while not stopping:
+            operation = held if held is not None else self._queue.get()
+            held = None
+            if operation is None:
+                break
+            batch = [operation]
+            # Agrupar las operaciones pequeñas que ya estén en cola, hasta el límite del lote
+            while not operation.exclusive and len(batch) < self.max_batch:
+                try:
+                    queued = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if queued is None:
+                    stopping = True
+                    break
+                if queued.exclusive:
+                    held = queued
+                    break
+                batch.append(queued)
+            self._apply(batch)
+
+    def _apply(self, batch: List[_Operation]):
+        """Aplicar un lote en una transacción (o una a una si ésta falla)"""
+        running = []
+        for operation in batch:
+            if operation.future.set_running_or_notify_cancel():
+                running.append(operation)
+            else:
+                self._cleanup(operation)
+        batch = running
+        if not batch:
+            return
+        try:
+            results = self._transaction(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+            logger.warning(f"Scan writer batch of {len(batch)} failed ({e}), retrying operations one by one")
+            for operation in batch:
+                try:
+                    result = self._transaction([operation])[0]
+                except Exception as operation_error:
+                    self._fail(operation, operation_error)
+                else:
+                    operation.future.set_result(result)
+            return
+        for operation, result in zip(batch, results):
+            operation.future.set_result(result)
+
+    def _transaction(self, batch: List[_Operation]) -> List[Any]:
+        db = self.session_factory()
+        # Los escaneos devueltos se leen después de cerrar la sesión
+        db.expire_on_commit = False
+        try:
+            results = [operation.method(db, *operation.args, commit=False) for operation in batch]
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        with self._lock:
+            self._stats["operations"] += len(batch)
+            self._stats["transactions"] += 1
+        return results
+
+    def _fail(self, operation: _Operation, error: Exception):
+        logger.error(f"Scan writer operation failed: {error}")
+        with self._lock:
+            self._stats["failed"] += 1
+        self._cleanup(operation)
+        operation.future.set_exception(error)
+
+    def _cleanup(self, operation: _Operation):
+        """Deshacer en su propia transacción lo que dejó una operación fallida o cancelada"""
+        if operation.cleanup is None:
+            return
+        db = self.session_factory()
+        try:
+            operation.cleanup(db, commit=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Scan writer cleanup failed: {e}")
+        finally:
+            db.close()
@@ -15,7 +15,8 @@ const ScanForm = ({ onScanStarted }) => {
     { value: 'sast', label: 'SAST - Análisis de Código Fuente', description: 'Busca vulnerabilidades en el código fuente' },
     { value: 'sca', label: 'SCA - Análisis de Dependencias', description: 'Escanea vulnerabilidades en dependencias' },
     { value: 'docker', label: 'Docker - Análisis de Imágenes', description: 'Analiza vulnerabilidades en imágenes Docker' },
-    { value: 'secrets', label: 'Secrets - Detección de Secretos', description: 'Busca credenciales y secretos expuestos' }
+    { value: 'secrets', label: 'Secrets - Detección de Secretos', description: 'Busca credenciales y secretos expuestos' },
+    { value: 'full', label: 'Full - Evaluación Completa', description: 'Ejecuta SAST, SCA y Secrets en paralelo sobre el mismo objetivo' }
   ];
 
   const handleFileChange = (e) => {
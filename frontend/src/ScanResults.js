@@ -1,38 +1,84 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './ScanResults.css';
 
 const API_BASE_URL = 'http://localhost:8000';
 
+const FINDINGS_PAGE_SIZE = 100;
+const FINAL_STATUSES = ['completed', 'failed', 'cancelled'];
+
 const ScanResults = ({ scanId }) => {
   const [scanResult, setScanResult] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [findings, setFindings] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingFindings, setLoadingFindings] = useState(false);
+  const [severityFilter, setSeverityFilter] = useState('');
+  const [sortOrder, setSortOrder] = useState('severity');
+  // Consulta de hallazgos vigente: las respuestas de consultas anteriores se descartan
+  const findingsQuery = useRef(null);
+
+  const status = scanResult ? scanResult.status : null;
 
   useEffect(() => {
     if (scanId) {
+      setScanResult(null);
+      setLoading(true);
       fetchScanResult();
+    }
+  }, [scanId]);
+
+  // Polling sólo del estado y el resumen, hasta que el escaneo termina
+  useEffect(() => {
+    if (scanId && !FINAL_STATUSES.includes(status)) {
       const interval = setInterval(fetchScanResult, 3000); // Actualizar cada 3 segundos
       return () => clearInterval(interval);
     }
-  }, [scanId]);
+  }, [scanId, status]);
+
+  // Los hallazgos se piden una vez completado el escaneo, página a página
+  useEffect(() => {
+    findingsQuery.current = `${scanId}|${severityFilter}|${sortOrder}`;
+    setFindings([]);
+    setNextCursor(null);
+    setLoadingFindings(false);
+    if (scanId && status === 'completed') {
+      fetchFindings(null);
+    }
+  }, [scanId, status, severityFilter, sortOrder]);
 
   const fetchScanResult = async () => {
     try {
       const response = await axios.get(`${API_BASE_URL}/api/scan/${scanId}`);
       setScanResult(response.data);
       setLoading(false);
-      
-      // Si el escaneo está completo, dejar de hacer polling
-      if (response.data.status === 'completed' || response.data.status === 'failed') {
-        setLoading(false);
-      }
     } catch (err) {
       setError('Error fetching scan results');
       setLoading(false);
     }
   };
 
+  const fetchFindings = async (cursor) => {
+    const query = `${scanId}|${severityFilter}|${sortOrder}`;
+    const isCurrent = () => findingsQuery.current === query;
+    setLoadingFindings(true);
+    try {
+      const params = { limit: FINDINGS_PAGE_SIZE, sort: sortOrder };
+      if (severityFilter) params.severity = severityFilter;
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API_BASE_URL}/api/scan/${scanId}/findings`, { params });
+      // El filtro o el orden cambiaron mientras llegaba la respuesta
+      if (!isCurrent()) return;
+      setFindings((previous) => (cursor ? [...previous, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (err) {
+      if (isCurrent()) setError('Error fetching scan findings');
+    } finally {
+      if (isCurrent()) setLoadingFindings(false);
+    }
+  };
+
   const getSeverityColor = (severity) => {
     const colors = {
       critical: '#dc2626',
@@ -142,10 +188,24 @@ const ScanResults = ({ scanId }) => {
 
       <div className="findings-section">
         <h3>Hallazgos Detallados</h3>
-        {scanResult.findings && scanResult.findings.length > 0 ? (
+        <div className="findings-filters">
+          <select value={severityFilter} onChange={(e) => setSeverityFilter(e.target.value)}>
+            <option value="">Todas las severidades</option>
+            <option value="critical">Crítica</option>
+            <option value="high">Alta</option>
+            <option value="medium">Media</option>
+            <option value="low">Baja</option>
+            <option value="info">Informativa</option>
+          </select>
+          <select value={sortOrder} onChange={(e) => setSortOrder(e.target.value)}>
+            <option value="severity">Ordenar por severidad</option>
+            <option value="id">Ordenar por detección</option>
+          </select>
+        </div>
+        {findings.length > 0 ? (
           <div className="findings-list">
-            {scanResult.findings.map((finding, index) => (
-              <div key={index} className="finding-card">
+            {findings.map((finding) => (
+              <div key={finding.id} className="finding-card">
                 <div className="finding-header">
                   <div className="finding-severity">
                     <span 
@@ -192,6 +252,19 @@ const ScanResults = ({ scanId }) => {
                 </div>
               </div>
             ))}
+            {nextCursor && (
+              <button
+                className="load-more"
+                onClick={() => fetchFindings(nextCursor)}
+                disabled={loadingFindings}
+              >
+                {loadingFindings ? 'Cargando...' : 'Cargar más hallazgos'}
+              </button>
+            )}
+          </div>
+        ) : loadingFindings ? (
+          <div className="no-findings">
+            <p>Cargando hallazgos...</p>
           </div>
         ) : (
           <div className="no-findings">